@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Benchmark for encoding a large, mostly non-ASCII document as HTML entities
+
+Compares, on the same document:
+- the original codec error handler, which built each entity a character
+  at a time (reproduced here as old_html_replace);
+- text.encode('ascii', 'html_replace'), the codec path with the current
+  handler;
+- html_replace.encode() and iterencode() with the NAMED table;
+- xmlcharrefreplace against encode() with the NUMERIC table.
+
+All the named results are checked to be the same before anything is timed.
+
+Usage:
+python bench/html_replace_encode.py [--words 700000] [--repeat 3]
+'''
+
+import argparse
+import codecs
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'Support', 'Library'))
+
+import cp_html_replace as html_replace
+
+clock = getattr(time, 'process_time', time.time)
+
+# Greek, CJK, emoji and punctuation, with a little ASCII in between
+WORDS = [u'Ελληνικά', u'καλημέρα', u'Ωμέγα', u'naïve', u'café', u'—', u'…', u'€100', u'日本語', u'😀', u'text', u' ']
+
+
+def old_html_replace(error):
+    '''The html_replace handler as it was, one entity per character'''
+    s = []
+    for c in error.object[error.start:error.end]:
+        if ord(c) in html_replace.html.codepoint2name:
+            s.append(u'&%s;' % html_replace.html.codepoint2name[ord(c)])
+        else:
+            s.append(u'&#%s;' % ord(c))
+    return u''.join(s), error.end
+
+codecs.register_error('old_html_replace', old_html_replace)
+
+
+def best(f, repeat):
+    '''The best of `repeat` timings of f(), in seconds'''
+    times = []
+    for i in range(repeat):
+        start = clock()
+        f()
+        times.append(clock() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--words', type=int, default=700000, help='words in the document')
+    parser.add_argument('--repeat', type=int, default=3, help='timings to take the best of')
+    args = parser.parse_args()
+
+    r = random.Random(1)
+    doc = u''.join(r.choice(WORDS) for i in range(args.words))
+    non_ascii = sum(1 for c in doc if ord(c) > 127)
+    print('%d characters, %.0f%% non-ASCII' % (len(doc), 100.0 * non_ascii / len(doc)))
+
+    expected = doc.encode('ascii', 'old_html_replace')
+    assert doc.encode('ascii', 'html_replace') == expected
+    assert html_replace.encode(doc) == expected
+    assert b''.join(html_replace.iterencode(doc)) == expected
+    assert html_replace.encode(doc, html_replace.NUMERIC) == doc.encode('ascii', 'xmlcharrefreplace')
+
+    cases = [
+        ('old codec handler', lambda: doc.encode('ascii', 'old_html_replace')),
+        ("encode('ascii', 'html_replace')", lambda: doc.encode('ascii', 'html_replace')),
+        ('html_replace.encode()', lambda: html_replace.encode(doc)),
+        ('html_replace.iterencode()', lambda: b''.join(html_replace.iterencode(doc))),
+        ('xmlcharrefreplace', lambda: doc.encode('ascii', 'xmlcharrefreplace')),
+        ('html_replace.encode(NUMERIC)', lambda: html_replace.encode(doc, html_replace.NUMERIC)),
+    ]
+    for name, f in cases:
+        print('%-34s %.3fs' % (name, best(f, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
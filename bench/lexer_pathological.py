@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+'''
+Pathological-input benchmark for the PHP signature lexers
+
+Times the function and member_variable signature patterns from
+PHPDocblock.opt against lex_function and lex_member_variable on lines
+built to make the patterns backtrack, for growing n. The regex times
+grow polynomially; the lexer times should grow linearly. The two are
+checked to give the same groups wherever both are run.
+
+Usage:
+python bench/lexer_pathological.py [--max-regex-n 64]
+'''
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'Support', 'Library'))
+
+from PHPDocblock import PHPDocblock
+from PHPSignatureLexer import lex_function, lex_member_variable
+
+clock = getattr(time, 'process_time', time.time)
+
+LEXERS = {
+    'function': lex_function,
+    'member_variable': lex_member_variable,
+}
+
+# (signature, description, line for a given n)
+CASES = [
+    ('function', 'spaces after params', lambda n: 'function f()' + ' ' * n + '!\n'),
+    ('function', 'spaces after a body', lambda n: 'function f() {' + ' ' * n + '\n' + ' ' * n + '!'),
+    ('function', 'many parens', lambda n: 'function f(' + ') ' * n + '!\n'),
+    ('function', 'many bodies, two lines', lambda n: 'function f(' + '){' * n + '\n' + ' ' * n + '!'),
+    ('member_variable', 'spaces in a value', lambda n: 'var $a =' + ' ' * n + 'x' * n),
+    ('member_variable', 'modifiers', lambda n: 'public ' * n + 'x'),
+]
+
+SIZES = (16, 32, 64, 128, 1000, 10000, 100000)
+
+
+def timed(f, line):
+    '''Milliseconds to run f(line) once, and its result'''
+    start = clock()
+    result = f(line)
+    return (clock() - start) * 1e3, result
+
+
+def groups(match):
+    return match.groupdict() if match else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--max-regex-n', type=int, default=64,
+                        help="largest n to run the regex on (it's polynomial, so keep this small)")
+    args = parser.parse_args()
+
+    signatures = PHPDocblock.opt['signatures']
+    print('%-42s %7s %11s %11s' % ('pathological line (ms)', 'n', 'regex', 'lexer'))
+    for key, name, make in CASES:
+        pattern = re.compile(signatures[key]['pattern'])
+        lexer = LEXERS[key]
+        for n in SIZES:
+            line = make(n)
+            lexer_ms, lexed = timed(lexer, line)
+            if n <= args.max_regex_n:
+                regex_ms, matched = timed(pattern.match, line)
+                assert groups(matched) == groups(lexed), (key, name, n)
+                regex = '%11.2f' % regex_ms
+            else:
+                regex = '%11s' % '-'
+            print('%-42s %7d %s %11.3f' % (key + ': ' + name, n, regex, lexer_ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+'''
+Large-input benchmark for cp_actions.trim()
+
+Trims a 200k-line selection with the current trim() and with the one it
+replaced (reproduced here as old_trim: += per line, with the indent
+pattern compiled and the line break searched for on every line), for a
+few option sets, and checks that both give the same text.
+
+The old version is quadratic on Python 2, where unicode += copies the
+whole string, so pass a smaller --lines there.
+
+Usage:
+python bench/trim_lines.py [--lines 200000] [--repeat 3]
+'''
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'Support', 'Library'))
+
+import cp_actions
+
+clock = getattr(time, 'process_time', time.time)
+
+INDENT = '    '
+
+OPTIONS = [
+    dict(),
+    dict(respect_indent=True, discard_empty=True),
+    dict(sides='end'),
+    dict(sides='start', respect_indent=True),
+    dict(lines=False),
+]
+
+
+def old_trim(context, text, lines=True, sides='both', respect_indent=False,
+             preserve_linebreaks=True, discard_empty=False):
+    '''trim() as it was'''
+    def trimit(text, sides, indent, preserve_linebreaks, discard_empty):
+        if discard_empty:
+            match = re.match(r'\s*?([\n\r]+)$', text)
+            if match:
+                return match.group(1)
+        if (sides.lower() == 'both' or sides.lower() == 'start') and indent != '':
+            match = re.match('(' + indent + ')+', text)
+            if match:
+                indent_chars = match.group(0)
+            else:
+                indent_chars = ''
+        else:
+            indent_chars = ''
+        match = re.search(r'[\n\r]+$', text)
+        if match and preserve_linebreaks:
+            linebreak = match.group(0)
+        else:
+            linebreak = ''
+        if sides.lower() == 'start':
+            text = text.lstrip()
+        elif sides.lower() == 'end':
+            text = text.rstrip()
+        else:
+            text = text.strip()
+        return indent_chars + text + linebreak
+
+    if respect_indent:
+        indent = INDENT
+    else:
+        indent = ''
+    finaltext = ''
+    if lines:
+        for line in text.splitlines(True):
+            finaltext += trimit(line, sides, indent, preserve_linebreaks, discard_empty)
+    else:
+        finaltext = trimit(text, sides, indent, preserve_linebreaks, discard_empty)
+    return finaltext
+
+
+def selection(lines):
+    '''Code with ragged indentation, blank lines and trailing whitespace'''
+    r = random.Random(1)
+    return u''.join(
+        r.choice(['', INDENT, INDENT * 2])
+        + r.choice(['foo = bar(1, 2)', 'return x', '', '   ', '# comment here'])
+        + r.choice(['', '  ', '\t'])
+        + '\n'
+        for i in range(lines)
+    )
+
+
+def best(f, repeat):
+    '''The best of `repeat` timings of f(), in seconds, and its result'''
+    times = []
+    for i in range(repeat):
+        start = clock()
+        result = f()
+        times.append(clock() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--lines', type=int, default=200000, help='lines in the selection')
+    parser.add_argument('--repeat', type=int, default=3, help='timings to take the best of')
+    args = parser.parse_args()
+
+    # trim() only asks the context for its indentation string
+    cp_actions.get_indentation_string = lambda context: INDENT
+
+    text = selection(args.lines)
+    print('%d characters, %d lines' % (len(text), args.lines))
+    print('%-48s %9s %9s' % ('options', 'old', 'new'))
+    for options in OPTIONS:
+        old_time, old = best(lambda: old_trim(None, text, **options), args.repeat)
+        new_time, new = best(lambda: cp_actions.trim(None, text, **options), args.repeat)
+        assert old == new, options
+        print('%-48s %8.3fs %8.3fs' % (options, old_time, new_time))
+
+
+if __name__ == '__main__':
+    main()
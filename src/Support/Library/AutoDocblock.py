@@ -1,4 +1,5 @@
 from Docblock import Docblock
+from DocumentScanner import DEFAULT_LOOKAHEAD
 from PHPDocblock import PHPDocblock
 #from PyDocblock import PyDocblock
 
@@ -14,10 +15,13 @@ class AutoDocblock(Docblock):
     def doc(self, text):
         
         for c in self.classes:
-           d = c()
-           d.setLineEnding(self.opt['line_ending'])
+           d = c(self.opt['line_ending'])
            docblock = d.doc(text)
            
            if docblock: return docblock
            
-        return None
\ No newline at end of file
+        return None
+    
+    def documentLines(self, lines, lookahead=DEFAULT_LOOKAHEAD):
+        d = self.classes[0](self.opt['line_ending'])
+        return d.documentLines(lines, lookahead)
@@ -1,6 +1,12 @@
 '''Docblock generator class'''
 
-import re
+import threading
+
+from DocblockCache import DocblockCache
+from DocumentScanner import DEFAULT_LOOKAHEAD, DocumentScanner, split_lines
+from LiteralClassifier import FLOAT
+from param_parser import parse_params
+from SignatureRegistry import SignatureRegistry
 
 # These imports are actually done inside the Docblock class to fix a circular reference.
 #from AutoDocblock import AutoDocblock
@@ -8,18 +14,34 @@ import re
 #from PyDocblock import PyDocblock
 #from JSDocblock import JSDocblock
 
+# file extensions we'll treat as PHP source
+PHP_EXTENSIONS = ('php', 'phtml', 'php3', 'php4', 'php5', 'ph3', 'ph4', 'ph5', 'phps', 'module', 'inc', 'install',)
+
 
 class Docblock(object):
     """
     Generic Docblock generator class
+    
+    Generators are configured when they're created, and keep the state of
+    the signature they're documenting per thread, so a single instance can
+    be shared by any number of threads.
     """
     
     opt = {
         'line_ending': '\n',
     }
     
+    def __init__(self, line_ending=None):
+        # our own copy of the options, so configuring one instance doesn't
+        # change every other instance of the class.
+        self.opt = dict(self.opt)
+        if line_ending is not None:
+            self.opt['line_ending'] = line_ending
+        
+        self._state = threading.local()
+    
     @staticmethod
-    def get(ext):
+    def get(ext, line_ending=None):
         """
         Get a Docblock instance for the requested file extension.
         
@@ -36,90 +58,229 @@ class Docblock(object):
         
         if ext: ext = ext.lower()
         
-        if ext in ('php', 'phtml', 'php3', 'php4', 'php5', 'ph3', 'ph4', 'ph5', 'phps', 'module', 'inc', 'install',):
-            return PHPDocblock()
+        if ext in PHP_EXTENSIONS:
+            return PHPDocblock(line_ending)
 #         elif ext in ('python', 'py',):
-#             return PyDocblock()
+#             return PyDocblock(line_ending)
 #         elif ext in ('javascript', 'js',):
-#             return JSDocblock()
+#             return JSDocblock(line_ending)
 #         elif ext in ('smarty', 'tpl',):
-#             return SmartyDocblock()
+#             return SmartyDocblock(line_ending)
         else:
             # at this point we'll try just about anything...
-            return AutoDocblock()
+            return AutoDocblock(line_ending)
+    
+    @classmethod
+    def registry(cls):
+        """
+        Get the compiled signature registry for this generator class.
+        """
+        return SignatureRegistry.forClass(cls)
+    
+    @classmethod
+    def enableCache(cls, size=1024):
+        """
+        Memoize generated docblocks for this generator class.
+        
+        Keeps the `size` most recently used docblocks, keyed on line ending and
+        signature, shared by every instance of the class.
+        """
+        registry = cls.registry()
+        if registry.cache is None:
+            registry.cache = DocblockCache(size)
+        else:
+            registry.cache.resize(size)
+        return registry.cache
+    
+    @classmethod
+    def disableCache(cls):
+        cls.registry().cache = None
+    
+    @classmethod
+    def cacheStats(cls):
+        """
+        Hit, miss and eviction counters for the docblock cache, or None if it's
+        not enabled.
+        """
+        cache = cls.registry().cache
+        if cache is not None:
+            return cache.stats()
     
     def setLineEnding(self, line_ending):
+        """
+        Change the line ending of this instance.
+        
+        This is configuration, so don't call it once the instance is shared
+        between threads: use withLineEnding() instead.
+        """
         self.opt['line_ending'] = line_ending
     
+    def withLineEnding(self, line_ending):
+        """
+        Get a generator like this one, using the given line ending.
+        """
+        if line_ending == self.opt['line_ending']:
+            return self
+        return self.__class__(line_ending)
+    
+    @property
+    def signature(self):
+        """
+        The signature most recently documented (by this thread).
+        """
+        return getattr(self._state, 'signature', None)
+    
+    @signature.setter
+    def signature(self, value):
+        self._state.signature = value
+    
+    @property
+    def matches(self):
+        """
+        The named groups of the signature most recently documented (by this
+        thread), used by callbacks as a lookaround of sorts.
+        """
+        return getattr(self._state, 'matches', {})
+    
+    @matches.setter
+    def matches(self, value):
+        self._state.matches = value
+    
     def doc(self, sig):
         """
         Document a class, function or variable signature.
         """
         
+        cache = self.registry().cache
+        if cache is not None:
+            key = (self.opt['line_ending'], sig)
+            entry = cache.get(key)
+            if entry is not None:
+                return self._restore(sig, entry)
+        
+        s, result = self.matchSignature(sig)
+        
+        if not result:
+            self.signature = sig
+            self.matches = {}
+            docblock = None
+        else:
+            docblock = self._docSignature(sig, s, result)
+        
+        if cache is not None:
+            cache.set(key, (docblock, dict(self.matches)))
+        
+        return docblock
+    
+    def matchSignature(self, sig):
+        """
+        Find the signature matching this line.
+        
+        Returns a (signature, match) tuple, or (None, None) if nothing matches.
+        """
+        for s in self.registry().candidates(sig):
+            result = s.match(sig)
+            if result:
+                return s, result
+        
+        return None, None
+    
+    def docSignature(self, sig, s, result):
+        """
+        Document a line already matched by matchSignature().
+        """
+        
+        cache = self.registry().cache
+        if cache is None:
+            return self._docSignature(sig, s, result)
+        
+        key = (self.opt['line_ending'], sig)
+        entry = cache.get(key)
+        if entry is not None:
+            return self._restore(sig, entry)
+        
+        docblock = self._docSignature(sig, s, result)
+        cache.set(key, (docblock, dict(self.matches)))
+        return docblock
+    
+    def _restore(self, sig, entry):
+        """
+        Return a cached docblock, restoring the matches it was generated from.
+        """
+        docblock, matches = entry
+        self.signature = sig
+        self.matches = dict(matches)
+        return docblock
+    
+    def _docSignature(self, sig, s, result):
         # store this away for later, can be used by formatter functions to guess values, etc.
         self.signature = sig
         
         # we'll keep a dict of the most recent matches, can be used as a lookaround of sorts
         # (i.e. the access callback can look at self.matches[name] to see if the name starts
         # with the "_" character.
-        self.matches = {}
+        self.matches = result.groupdict()
         
-        docblock   = ''
         whitespace = ''
+        values = {}
         
-        for k, s in self.opt['signatures'].items():
-            result = re.match(s['pattern'], sig)
-            
-            if not result:
+        for name, match in self.matches.items():
+            if name == 'whitespace':
+                whitespace = match
                 continue
             
-            # we have a match, let's document!
-            
-            # remove whitespace at the front of the template, since it's
-            # not actually necessary for the docblock...
-            docblock = re.sub('\n[ \t]*', '\n', s['template'].strip())
-            
-            for name, match in result.groupdict().items():
-                self.matches[name] = match
-            
-            for name, match in result.groupdict().items():
-                if name == 'whitespace':
-                    whitespace = match
-                    continue
-                
-                if name in s['callbacks'].keys():
-                    match = self[s['callbacks'][name]](match)
-                
-                if not match:
-                    continue
-                
-                docblock = docblock.replace("%" + (name) + "%", match)
-            
-            # remove all the leftovers
-            docblock = re.sub('%[a-zA-Z]+%\n?', '', docblock).strip()
+            if name in s.callbacks:
+                match = s.callbacks[name](self, match)
             
-            # return pretty docblock
-            return self.formatDocblock(docblock, whitespace)
+            values[name] = match
+        
+        docblock = s.template.render(values)
+        
+        # return pretty docblock
+        return self.formatDocblock(docblock, whitespace)
+    
+    def documentLines(self, lines, lookahead=DEFAULT_LOOKAHEAD):
+        """
+        Document every undocumented declaration in a stream of source lines.
+        
+        Generates a (line, docblock) tuple for each line, where docblock is None
+        unless a docblock should be inserted directly before the line. Lines
+        should include their line endings.
+        
+        Headers spanning lines are documented whole, looking up to `lookahead`
+        lines past the first for the end of one (0 to only ever look at one line).
+        """
+        return DocumentScanner(self, lookahead).scan(lines)
+    
+    def documentSource(self, text, line_ending=None, lookahead=DEFAULT_LOOKAHEAD):
+        """
+        Document every undocumented declaration in a source file, in one pass.
+        
+        Returns a list of (offset, docblock) insertions, in document order.
+        """
+        d = self
+        if line_ending is not None:
+            d = self.withLineEnding(line_ending)
+        
+        insertions = []
+        offset = 0
+        for line, docblock in d.documentLines(split_lines(text, d.opt['line_ending']), lookahead):
+            if docblock:
+                insertions.append((offset, docblock))
+            offset += len(line)
+        
+        return insertions
     
     def formatDocblock(self, docblock, whitespace):
         # clean up white space and line endings
-        lines = []
-        if self.opt['prefix']:
-            lines.append(self.opt['prefix'])
-        lines += [(self.opt['infix'] + s).rstrip() for s in docblock.split('\n')]
-        # lines.extend(map(lambda s: self.opt['infix'] + s, docblock.split('\n')))
-        if self.opt['suffix']:
-            lines.append(self.opt['suffix'])
-        
-        return self.opt['line_ending'].join([whitespace + s for s in lines]) + self.opt['line_ending']
-        # return self.opt['line_ending'].join(map(lambda s: whitespace + s, lines))
+        return self.registry().formatter(self.opt, whitespace).format(docblock)
     
     def is_float(self, s):
-        try:
-            float(s)
-            return True
-        except:
-            return False
+        return FLOAT.match(s) is not None
+    
+    def guessType(self, s):
+        """Guess the type of this variable or param based on the default value."""
+        return self.registry().literals.classify(s)
     
     def keywordCallback(self, s):
         """
@@ -140,24 +301,20 @@ class Docblock(object):
         
         ret = []
         
-        for param_name in [p.strip() for p in s.split(',')]:
-            default = None
-            param_type = 'mixed'
+        for param in parse_params(s):
+            param_type = param.type
+            if param_type is None:
+                if param.default is not None:
+                    param_type = self.guessType(param.default)
+                else:
+                    param_type = 'mixed'
             
-            if "=" in param_name:
-                (param_name, default) = [chunk.strip() for chunk in param_name.split("=", 1)]
-            
-            if not param_name: return
-            
-            if " " in param_name:
-                (param_type, param_name) = [chunk.strip() for chunk in param_name.split(" ", 1)]
-            elif default is not None:
-                param_type = self.guessType(default)
-            
-            if default is not None:
-                ret.append("%sparam %s %s (default: %s)" % (self.opt['command'], param_type, param_name, default))
+            if param.default is not None:
+                ret.append("%sparam %s %s (default: %s)" % (self.opt['command'], param_type, param.declaration(), param.default))
             else:
-                ret.append("%sparam %s %s" % (self.opt['command'], param_type, param_name))
+                ret.append("%sparam %s %s" % (self.opt['command'], param_type, param.declaration()))
+        
+        if not ret: return
         
         return self.opt['line_ending'].join(ret)
     
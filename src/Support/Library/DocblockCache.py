@@ -0,0 +1,66 @@
+'''Bounded LRU cache for generated docblocks'''
+
+import threading
+
+from collections import OrderedDict
+
+
+class DocblockCache(object):
+    """
+    A bounded, least recently used cache of generated docblocks.
+
+    Safe to share between instances (and threads): each generator class
+    gets at most one, via Docblock.enableCache().
+    """
+
+    def __init__(self, size=1024):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.resetStats()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            # move it to the most recently used end
+            self.entries[key] = entry
+            self.hits += 1
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = entry
+
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def resize(self, size):
+        with self.lock:
+            self.size = size
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        return {
+            'size':      self.size,
+            'entries':   len(self.entries),
+            'hits':      self.hits,
+            'misses':    self.misses,
+            'evictions': self.evictions,
+        }
+
+    def resetStats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
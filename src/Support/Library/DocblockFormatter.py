@@ -0,0 +1,34 @@
+'''Precomputed docblock formatters'''
+
+
+class DocblockFormatter(object):
+    """
+    Lays out rendered docblocks for one combination of comment style, line
+    ending and indentation.
+
+    Everything which doesn't depend on the docblock itself -- the indented
+    prefix and suffix lines, the indented infix and the blank infix line --
+    is built once, so formatting a docblock is a single join.
+    """
+
+    def __init__(self, prefix, infix, suffix, line_ending, whitespace):
+        self.line_ending = line_ending
+
+        self.head = ''
+        if prefix:
+            self.head = whitespace + prefix + line_ending
+
+        self.infix = whitespace + infix
+
+        # i.e. `(infix + '').rstrip()`, for the empty lines in a docblock.
+        self.blank = whitespace + infix.rstrip()
+
+        self.tail = line_ending
+        if suffix:
+            self.tail = line_ending + whitespace + suffix + line_ending
+
+    def format(self, docblock):
+        infix = self.infix
+        blank = self.blank
+        lines = [s.rstrip() for s in docblock.split('\n')]
+        return self.head + self.line_ending.join([infix + s if s else blank for s in lines]) + self.tail
@@ -0,0 +1,86 @@
+'''Compiled docblock templates'''
+
+import re
+
+# `%name%` placeholders, along with the line break which follows them (if any).
+PLACEHOLDER = re.compile('%([a-zA-Z0-9_]+)%(\n?)')
+
+# insertion point tokens, i.e. `$$IP$$Foo function$$.`
+INSERTION_POINT = re.compile(r'\$\$(?:IP\$\$)?')
+
+LITERAL     = 0
+VALUE       = 1
+INSERTION   = 2
+
+
+class DocblockTemplate(object):
+    """
+    A docblock template, parsed once into a list of segments.
+
+    Each segment is a literal chunk of text, an insertion point token, or a
+    `%name%` placeholder. Rendering a template is a single pass over the
+    segments and a single join: placeholders without a value are dropped
+    along with the line break that follows them, so there's no need to go
+    back and clean up the leftovers afterwards.
+    """
+
+    def __init__(self, template):
+        self.source = template
+
+        # remove whitespace at the front of the template lines, since it's
+        # not actually necessary for the docblock...
+        template = re.sub('\n[ \t]*', '\n', template.strip())
+
+        self.segments = []
+        self.names = []
+
+        pos = 0
+        for match in PLACEHOLDER.finditer(template):
+            self._literal(template[pos:match.start()])
+
+            name, trail = match.groups()
+            if name.isalpha():
+                empty = ''
+            else:
+                # not something we'd ever clean up, so leave it be if empty.
+                empty = match.group(0)
+
+            self.segments.append((VALUE, name, trail, empty))
+            self.names.append(name)
+
+            pos = match.end()
+
+        self._literal(template[pos:])
+
+    def _literal(self, text):
+        pos = 0
+        for match in INSERTION_POINT.finditer(text):
+            if match.start() > pos:
+                self.segments.append((LITERAL, text[pos:match.start()], '', ''))
+            self.segments.append((INSERTION, match.group(0), '', ''))
+            pos = match.end()
+
+        if pos < len(text):
+            self.segments.append((LITERAL, text[pos:], '', ''))
+
+    def render(self, values):
+        """
+        Render the template with a dict of placeholder values.
+
+        Placeholders with no (or an empty) value are removed, along with the
+        line break directly after them.
+        """
+        parts = []
+        for kind, text, trail, empty in self.segments:
+            if kind != VALUE:
+                parts.append(text)
+                continue
+
+            value = values.get(text)
+            if value:
+                parts.append(value)
+                parts.append(trail)
+            elif empty:
+                parts.append(empty)
+
+        return ''.join(parts).strip()
@@ -0,0 +1,296 @@
+'''Whole document scanner for Docblock generators'''
+
+import re
+
+# the interesting bits of a line, as far as block structure goes: heredoc
+# and nowdoc openers (with the closing identifier as 'heredoc') and ?> too
+TOKENS = re.compile(r'''/\*|\*/|//|#|\\.|<<<[ \t]*(["']?)(?P<heredoc>[A-Za-z_]\w*)\1|\?>|["'{};]''')
+
+# back into PHP after a ?>
+PHP_OPEN = re.compile(r'<\?(?:php|=)')
+
+NAMESPACE = re.compile(r'\s*namespace\b')
+
+# the interesting bits of a declaration header
+HEADER_TOKENS = re.compile(r'''//|\\.|["'(){};]''')
+
+# lines to read past the first one looking for the end of a header
+DEFAULT_LOOKAHEAD = 10
+
+# which blocks each kind of declaration may be documented in (None is the top level)
+PLACEMENT = {
+    'class':           (None, 'namespace'),
+    'interface':       (None, 'namespace'),
+    'trait':           (None, 'namespace'),
+    'function':        (None, 'namespace', 'class'),
+    'member_variable': ('class',),
+}
+
+# the kind of block opened by the `{` following each kind of declaration
+OPENS = {
+    'class':     'class',
+    'interface': 'class',
+    'trait':     'class',
+    'function':  'function',
+}
+
+
+def split_lines(text, line_ending):
+    '''Split text into lines, keeping the line endings'''
+    len_line_ending = len(line_ending)
+    start = 0
+    while True:
+        end = text.find(line_ending, start)
+        if end == -1:
+            if start < len(text):
+                yield text[start:]
+            return
+        end += len_line_ending
+        yield text[start:end]
+        start = end
+
+
+class HeaderAssembler(object):
+    """
+    Puts a declaration header spread over several lines back together.
+
+    Feed it lines until feed() returns True: the header ends on the line
+    where its parens balance, or at a `{` or `;` outside of them. Each line
+    is scanned once. Give up once full(), i.e. after `lookahead` lines past
+    the first.
+    """
+
+    def __init__(self, lookahead=DEFAULT_LOOKAHEAD):
+        self.lookahead = lookahead
+        self.lines = []
+        self.parts = []
+        self.depth = 0
+        self.quote = None
+        self.complete = False
+
+    def feed(self, line):
+        self.lines.append(line)
+
+        end = len(line)
+        for match in HEADER_TOKENS.finditer(line):
+            token = match.group(0)
+
+            if self.quote:
+                if token == self.quote:
+                    self.quote = None
+            elif token in ('"', "'"):
+                self.quote = token
+            elif token == '(':
+                self.depth += 1
+            elif token == ')':
+                if self.depth:
+                    self.depth -= 1
+            elif token == '//':
+                # leave comments out of the header
+                end = match.start()
+                break
+            elif token in ('{', ';') and not self.depth:
+                self.complete = True
+                break
+
+        self.parts.append(line[:end].strip())
+
+        if not (self.depth or self.quote):
+            self.complete = True
+        return self.complete
+
+    def full(self):
+        return len(self.lines) > self.lookahead
+
+    def header(self):
+        """
+        The header as a single line, keeping the indentation of the first.
+        """
+        first = self.lines[0]
+        indent = first[:len(first) - len(first.lstrip())]
+        return indent + ' '.join([p for p in self.parts if p])
+
+
+class DocumentScanner(object):
+    """
+    Finds the undocumented declarations in a (C-like) source file.
+
+    Tracks just enough of the block structure -- braces, comments and
+    strings -- to tell class members from local variables, and skips
+    declarations which already have a docblock directly above them.
+    Lines are scanned once each, in a single pass. Declaration headers
+    spread over several lines are put back together (see HeaderAssembler)
+    and documented as one.
+    """
+
+    def __init__(self, docblock, lookahead=DEFAULT_LOOKAHEAD):
+        self.docblock = docblock
+        self.registry = docblock.registry()
+        self.lookahead = lookahead
+
+        self.blocks = []
+        self.pending = None
+        self.in_comment = False
+        self.in_string = None
+        # the pattern matching the closing line of a heredoc or nowdoc we're in
+        self.heredoc = None
+        # outside PHP, after a ?>
+        self.in_html = False
+        self.last = ''
+
+        # the declaration header being put back together, if any
+        self.header = None
+
+    def scope(self):
+        if self.blocks:
+            return self.blocks[-1]
+
+    def scan(self, lines, final=True):
+        for line in lines:
+            if self.header is not None:
+                for item in self.continueHeader(line):
+                    yield item
+                continue
+
+            docblock = None
+
+            if not (self.in_comment or self.in_string or self.heredoc or self.in_html):
+                docblock = self.document(line)
+                if self.header is not None:
+                    continue
+
+            self.advance(line)
+
+            stripped = line.strip()
+            if stripped:
+                self.last = stripped
+
+            yield line, docblock
+
+        if final and self.header is not None:
+            for item in self.abandonHeader():
+                yield item
+
+    def continueHeader(self, line):
+        header = self.header
+
+        if header.feed(line):
+            # document the whole header, as though it were all on its first line
+            self.header = None
+            docblock = self.document(header.header(), False)
+            for line in header.lines:
+                self.consume(line)
+                yield line, docblock
+                docblock = None
+
+        elif header.full():
+            for item in self.abandonHeader():
+                yield item
+
+    def abandonHeader(self):
+        # no end to the header in sight: carry on a line at a time from its first line.
+        header = self.header
+        self.header = None
+
+        self.consume(header.lines[0])
+        yield header.lines[0], None
+
+        for item in self.scan(header.lines[1:], False):
+            yield item
+
+    def consume(self, line):
+        self.advance(line)
+
+        stripped = line.strip()
+        if stripped:
+            self.last = stripped
+
+    def document(self, line, assemble=True):
+        s, result = self.docblock.matchSignature(line)
+
+        if not result:
+            if assemble and self.lookahead and '(' in line and self.registry.keyword(line):
+                header = HeaderAssembler(self.lookahead)
+                if not header.feed(line):
+                    # the rest of the header is on the lines to come.
+                    self.header = header
+                    return
+
+            if NAMESPACE.match(line):
+                self.pending = 'namespace'
+            return
+
+        self.pending = OPENS.get(s.key)
+
+        if self.scope() not in PLACEMENT.get(s.key, (None,)):
+            return
+
+        if self.last.endswith('*/'):
+            # already documented.
+            return
+
+        return self.docblock.docSignature(line, s, result)
+
+    def advance(self, line):
+        '''Update the block structure with everything on this line'''
+        pos = 0
+        if self.heredoc is not None:
+            match = self.heredoc.match(line)
+            if match is None:
+                return
+            # the rest of the closing line is code again
+            self.heredoc = None
+            pos = match.end()
+
+        while True:
+            if self.in_html:
+                match = PHP_OPEN.search(line, pos)
+                if match is None:
+                    return
+                self.in_html = False
+                pos = match.end()
+
+            match = TOKENS.search(line, pos)
+            if match is None:
+                return
+            pos = match.end()
+            token = match.group(0)
+
+            if token[0] == '\\' and not self.in_string:
+                # only an escape inside a string: look at what follows it again
+                pos = match.start() + 1
+                continue
+
+            if self.in_comment:
+                if token == '*/':
+                    self.in_comment = False
+            elif self.in_string:
+                if token == self.in_string:
+                    self.in_string = None
+            elif token == '{':
+                self.blocks.append(self.pending or 'block')
+                self.pending = None
+            elif token == '}':
+                if self.blocks:
+                    self.blocks.pop()
+                self.pending = None
+            elif token == ';':
+                self.pending = None
+            elif token == '/*':
+                self.in_comment = True
+            elif token in ('//', '#'):
+                # a one-line comment ends at the line's end, or at a ?>
+                end = line.find('?>', pos)
+                if end == -1:
+                    return
+                self.in_html = True
+                pos = end + 2
+            elif token in ('"', "'"):
+                self.in_string = token
+            elif token == '?>':
+                self.in_html = True
+            elif token.startswith('<<<'):
+                # the body starts on the next line, and runs to a line
+                # starting with the identifier
+                self.heredoc = re.compile(r'[ \t]*%s\b' % match.group('heredoc'))
+                return
@@ -0,0 +1,68 @@
+'''Table-driven type guessing for literal values'''
+
+import re
+import sys
+
+# literals to remember per generator class. defaults repeat a lot (null,
+# true, '', array(), 0...), so a few hundred covers nearly all of them.
+MAX_LITERALS = 512
+
+# digits, as float() takes them (underscores between digits since 3.6)
+if sys.version_info >= (3, 6):
+    DIGITS = r'\d+(?:_\d+)*'
+else:
+    DIGITS = r'\d+'
+
+# anything float() would take, without having to call it and catch the
+# ValueError when it won't.
+FLOAT_PATTERN = r'\s*[-+]?(?:(?:%(d)s(?:\.(?:%(d)s)?)?|\.%(d)s)(?:[eE][-+]?%(d)s)?|[iI][nN][fF](?:[iI][nN][iI][tT][yY])?|[nN][aA][nN])\s*\Z' % {'d': DIGITS}
+
+FLOAT = re.compile(FLOAT_PATTERN, re.UNICODE)
+
+
+class LiteralClassifier(object):
+    """
+    Guesses the type of a literal (a default or initial value) in one match.
+
+    The table is a sequence of (type, pattern) pairs, in order of
+    precedence: the first pattern matching at the start of the literal
+    wins. Patterns are compiled together with DOTALL and UNICODE, and must
+    not have capturing groups of their own. Anything not matched is the
+    default type.
+
+    \\d only matches decimal digits, but str.isdigit() also takes the likes
+    of superscripts and circled digits. Literals made of those aren't
+    matched by a \\d+ pattern, so they get whatever type '0' gets instead.
+    """
+
+    def __init__(self, table, default='mixed'):
+        self.types = [t for t, p in table]
+        self.default = default
+        self.pattern = None
+        if self.types:
+            self.pattern = re.compile('|'.join(['(%s)' % p for t, p in table]), re.DOTALL | re.UNICODE)
+
+        self.memo = {}
+        self.digits = self._match('0') or default
+
+    def _match(self, s):
+        if self.pattern is not None:
+            match = self.pattern.match(s)
+            if match:
+                return self.types[match.lastindex - 1]
+
+    def classify(self, s):
+        if not s:
+            return self.default
+
+        result = self.memo.get(s)
+        if result is None:
+            result = self._match(s)
+            if result is None:
+                result = self.digits if s.isdigit() else self.default
+
+            if len(self.memo) >= MAX_LITERALS:
+                self.memo.clear()
+            self.memo[s] = result
+
+        return result
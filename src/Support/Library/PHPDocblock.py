@@ -1,4 +1,6 @@
 from Docblock import Docblock
+from LiteralClassifier import FLOAT_PATTERN
+from PHPSignatureLexer import lex_function, lex_member_variable
 
 class PHPDocblock(Docblock):
     """
@@ -29,8 +31,25 @@ class PHPDocblock(Docblock):
 #         
 #         'command': '\\',
         
+        # keywords which may come before any of the signature keywords below.
+        # used to pick the one candidate signature for a line before running
+        # the full patterns.
+        'modifiers': ('abstract', 'final', 'static', 'private', 'public', 'protected', 'var'),
+        
+        # (type, pattern) pairs for guessing the type of a default value, in
+        # order of precedence. see LiteralClassifier.
+        'literals': (
+            ('string', r'[^"\']*["\']'),
+            ('array',  r'.*?a *r *r *a *y *\('),
+            ('bool',   r'\s*(?:true|false)\s*\Z'),
+            ('int',    r'\d+\Z'),
+            ('float',  FLOAT_PATTERN),
+        ),
+        
         'signatures': {
             'function': {
+                'keyword': 'function',
+                'lexer':   lex_function,
                 'pattern': '^(?P<whitespace>\s*)(?:(?:(?P<abstract>abstract)|(?P<final>final)|(?P<static>static)|(?P<access>private|public|protected))\s+)*function\s*&?(?P<name>[-a-zA-Z0-9_]+)\s*\((?P<params>.*)\)\s*(?:{.*}?|;)?\s*:?\s*(?P<return>[-a-zA-Z0-9_]+)?\s*$',
                 'template':
                     """
@@ -54,6 +73,7 @@ class PHPDocblock(Docblock):
             },
             
             'class': {
+                'keyword': 'class',
                 'pattern': '^(?P<whitespace>\s*)(?:(?:(?:(?P<abstract>abstract)|(?P<final>final)|(?P<static>static))\s+)*)class\s+(?P<name>[-a-zA-Z0-9_]+)(?:\s+extends\s+(?P<extends>[-a-zA-Z0-9_]+))?(?:\s+implements\s+(?P<implements>[-a-zA-Z0-9_,\s]+))?',
                 'template':
                     """
@@ -76,6 +96,7 @@ class PHPDocblock(Docblock):
             },
             
             'interface': {
+                'keyword': 'interface',
                 'pattern': '^(?P<whitespace>\s*)interface\s+(?P<name>[-a-zA-Z0-9_]+)(?:\s+extends\s+(?P<extends>[-a-zA-Z0-9_]+))?',
                 'template':
                      """
@@ -89,6 +110,7 @@ class PHPDocblock(Docblock):
             },
 
             'trait': {
+                'keyword': 'trait',
                 'pattern': '^(?P<whitespace>\s*)trait\s+(?P<name>[-a-zA-Z0-9_]+)',
                 'template':
                      """
@@ -99,6 +121,8 @@ class PHPDocblock(Docblock):
             },
 
             'member_variable': {
+                'keyword': '$',
+                'lexer':   lex_member_variable,
                 'pattern': '(?P<whitespace>\s*)(?:(?:(?P<abstract>abstract)|(?P<static>static)|(?P<final>final)|(?P<access>private|public|protected))\s+)*(?:var\s+)?\$(?P<name>[-a-zA-Z0-9_]+)(?:\s*=\s*(?P<value>[^;]+);)?',
                 'template':
                     """
@@ -187,23 +211,5 @@ class PHPDocblock(Docblock):
             ret = ""
         
         return "%s%svar %s" % (ret, self.opt['command'], self.guessType(s))
-    
-    def guessType(self, s):
-        """Guess the type of this variable or param based on the default value."""
-        
-        if not s:
-            return 'mixed'
-        elif '"' in s or "'" in s:
-            return 'string'
-        elif 'array(' in s.replace(' ', ''):
-            return 'array'
-        elif s.strip() in ['true', 'false']:
-            return 'bool'
-        elif s.isdigit():
-            return 'int'
-        elif self.is_float(s):
-            return 'float'
-        else:
-            return 'mixed'
 
 
@@ -0,0 +1,137 @@
+'''
+Linear time matching for PHP declaration headers
+
+Drop-in replacements for the PHPDocblock `function` and `member_variable`
+signature patterns, which backtrack polynomially when they fail on long
+lines full of whitespace or parens. Each lexer returns a match with exactly
+the same groups as the pattern would, or None; the worst case is linear in
+the length of the line.
+
+Member variables and single line function headers are still a single regex
+match, with the patterns rewritten so they can't backtrack far. Function
+headers spanning lines are scanned by hand.
+'''
+
+import re
+
+# Declaration heads, up to and including the `(`. Anchored, and none of the
+# repeats can overlap what follows them, so they fail in linear time too.
+FUNCTION_HEAD   = r'(?P<whitespace>\s*)(?:(?:(?P<abstract>abstract)|(?P<final>final)|(?P<static>static)|(?P<access>private|public|protected))\s+)*function\s*&?(?P<name>[-a-zA-Z0-9_]+)\s*\('
+
+# A function header on a single line. The end of the header -- `\s*(?:{.*}?
+# |;)?\s*:?\s*(?P<return>...)?\s*$` in the signature pattern -- is rewritten so
+# that no two repeats can match the same text: each `)` tried for the end of
+# the params is either accepted or ruled out before the next one along, so
+# this can't go polynomial on a single line.
+FUNCTION        = re.compile(FUNCTION_HEAD + r'(?P<params>[^\n]*)\)\s*(?:(?:\{[^\n]*|;)\s*)?(?::\s*)?(?:(?P<return>[-a-zA-Z0-9_]+)\s*)?\Z')
+
+FUNCTION_START  = re.compile(FUNCTION_HEAD)
+
+# A member variable. Same groups as the signature pattern, but the value
+# can't backtrack: it either starts with something other than whitespace, or
+# (if there's nothing but whitespace before the `;`) it's the last of it.
+MEMBER_VARIABLE = re.compile(r'(?P<whitespace>\s*)(?:(?:(?P<abstract>abstract)|(?P<static>static)|(?P<final>final)|(?P<access>private|public|protected))\s+)*(?:var\s+)?\$(?P<name>[-a-zA-Z0-9_]+)(?:\s*=\s*(?P<value>[^;\s][^;]*|\s);)?')
+
+SPACES          = re.compile(r'\s*')
+
+WORD_CHARS      = frozenset('-abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_')
+
+# the end of a function header, `\s*:?\s*(?P<return>...)?\s*$`, backwards.
+REVERSED_TAIL   = re.compile(r'\s*([-a-zA-Z0-9_]*)\s*(?::\s*)?')
+
+
+class LexerMatch(object):
+    """
+    The result of a successful hand-lexed match; quacks like a regex match.
+    """
+
+    def __init__(self, groups):
+        self.groups = groups
+
+    def group(self, name):
+        return self.groups[name]
+
+    def groupdict(self):
+        return self.groups
+
+
+def _tail(sig):
+    """
+    Find where the end of a function header can start.
+
+    Returns (start, word_start, word_end): the end of the header matches from
+    any position at or after start, and the return type (if any) is
+    sig[word_start:word_end].
+    """
+    length = len(sig)
+    match = REVERSED_TAIL.match(sig[::-1])
+    return length - match.end(), length - match.end(1), length - match.start(1)
+
+
+def lex_function(sig):
+    eol = sig.find('\n')
+    if eol == -1 or eol == len(sig) - 1:
+        return FUNCTION.match(sig)
+
+    match = FUNCTION_START.match(sig)
+    if not match:
+        return None
+    start = match.end()
+
+    # params can't span lines...
+    eol = sig.find('\n', start)
+    if eol == -1:
+        eol = len(sig)
+
+    # ... and run up to the last `)` which leaves a valid end of the header.
+    # `\)\s*(?:{.*}?|;)?\s*:?\s*(?P<return>...)?\s*$` is polynomial when it
+    # fails on a long line, so find where the end of the header could start
+    # just once, then check each `)` against it.
+    tail = None
+    close = sig.rfind(')', start, eol)
+    while close != -1:
+        pos = SPACES.match(sig, close + 1).end()
+        if sig.startswith('{', pos):
+            # `{.*}?` runs to the end of the line, and the rest of the header follows it.
+            if pos < eol:
+                pos = eol
+            else:
+                pos = sig.find('\n', pos + 1)
+                if pos == -1:
+                    pos = len(sig)
+
+            if pos >= len(sig) - 1:
+                # i.e. a one line function body.
+                groups = match.groupdict()
+                groups['params'] = sig[start:close]
+                groups['return'] = None
+                return LexerMatch(groups)
+        else:
+            if sig.startswith(';', pos):
+                pos += 1
+
+            # the end of the header can only be whitespace, `:`, the return
+            # type and more whitespace, so the next thing along usually rules it out.
+            following = SPACES.match(sig, pos).end()
+            following = sig[following:following + 1]
+            if following and following != ':' and following not in WORD_CHARS:
+                close = sig.rfind(')', start, close)
+                continue
+
+        if tail is None:
+            tail = _tail(sig)
+        tail_start, word, word_end = tail
+
+        if pos >= tail_start:
+            groups = match.groupdict()
+            groups['params'] = sig[start:close]
+            groups['return'] = sig[max(pos, word):word_end] or None
+            return LexerMatch(groups)
+
+        close = sig.rfind(')', start, close)
+
+    return None
+
+
+def lex_member_variable(sig):
+    return MEMBER_VARIABLE.match(sig)
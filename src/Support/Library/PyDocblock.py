@@ -1,4 +1,5 @@
 from Docblock import Docblock
+from LiteralClassifier import FLOAT_PATTERN
 
 class PyDocblock(Docblock):
     """
@@ -13,8 +14,24 @@ class PyDocblock(Docblock):
         'suffix':  None,
         'command': '@',
         
+        # keywords which may come before any of the signature keywords below.
+        # used to pick the one candidate signature for a line before running
+        # the full patterns.
+        'modifiers': ('abstract', 'final', 'static', 'private', 'public', 'protected', 'var'),
+        
+        # (type, pattern) pairs for guessing the type of a default value, in
+        # order of precedence. see LiteralClassifier.
+        'literals': (
+            ('array',  r'.*?array\('),
+            ('bool',   r'.*?(?:true|false)'),
+            ('string', r'[^"\']*["\']'),
+            ('int',    r'\d+\Z'),
+            ('float',  FLOAT_PATTERN),
+        ),
+        
         'signatures': {
             'function': {
+                'keyword': 'function',
                 'pattern': '^(?P<whitespace>\s*)(?:(?:(?P<abstract>abstract)|(?P<final>final)|(?P<static>static)|(?P<access>private|public|protected))\s+)*function\s*&?(?P<name>[-a-zA-Z0-9_]+)\s*\((?P<params>.*)\)\s*(?:{.*}?|;)?\s*$',
                 'template':
                     """
@@ -37,6 +54,7 @@ class PyDocblock(Docblock):
             },
             
             'class': {
+                'keyword': 'class',
                 'pattern': '^(?P<whitespace>\s*)(?:(?:(?:(?P<abstract>abstract)|(?P<final>final)|(?P<static>static))\s+)*)class\s+(?P<name>[-a-zA-Z0-9_]+)(?:\s+extends\s+(?P<extends>[-a-zA-Z0-9_]+))?(?:\s+implements\s+(?P<implements>[-a-zA-Z0-9_,\s]+))?',
                 'template':
                     """
@@ -59,6 +77,7 @@ class PyDocblock(Docblock):
             },
             
             'interface': {
+                'keyword': 'interface',
                 'pattern': '^(?P<whitespace>\s*)interface\s+(?P<name>[-a-zA-Z0-9_]+)(?:\s+extends\s+(?P<extends>[-a-zA-Z0-9_]+))?',
                 'template':
                      """
@@ -72,6 +91,7 @@ class PyDocblock(Docblock):
             },
             
             'member_variable': {
+                'keyword': '$',
                 'pattern': '(?P<whitespace>\s*)(?:(?:(?P<abstract>abstract)|(?P<static>static)|(?P<final>final)|(?P<access>private|public|protected))\s+)*(?:var\s+)?\$(?P<name>[-a-zA-Z0-9_]+)(?:\s*=\s*(?P<value>[^;]+);)?',
                 'template':
                     """
@@ -152,23 +172,5 @@ class PyDocblock(Docblock):
             ret = ""
         
         return "%s%svar %s" % (ret, self.opt['command'], self.guessType(s))
-    
-    def guessType(self, s):
-        """Guess the type of this variable or param based on the default value."""
-        
-        if not s:
-            return 'mixed'
-        elif s.find('array(') > -1:
-            return 'array'
-        elif s.find('true') > -1 or s.find('false') > -1:
-            return 'bool'
-        elif s.find('"') > -1 or s.find("'") > -1:
-            return 'string'
-        elif s.isdigit():
-            return 'int'
-        elif self.is_float(s):
-            return 'float'
-        else:
-            return 'mixed'
 
 
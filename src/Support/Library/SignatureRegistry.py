@@ -0,0 +1,171 @@
+'''Compiled signature registry for Docblock generators'''
+
+import re
+import threading
+
+from DocblockFormatter import DocblockFormatter
+from DocblockTemplate import DocblockTemplate
+from LiteralClassifier import LiteralClassifier
+
+# formatters to keep around per generator class. a source file only uses a
+# handful of indentation levels, so this is plenty.
+MAX_FORMATTERS = 256
+
+
+class Signature(object):
+    """
+    A single docblock signature, compiled and ready to use.
+
+    Holds the compiled pattern, the normalized template and the callbacks
+    bound to the generator class, so none of it has to be rebuilt for
+    every line we document.
+
+    A signature may also supply a `lexer`: a function taking the line and
+    returning a match with the same groups as the pattern (or None), used
+    in place of the pattern to match lines.
+    """
+
+    def __init__(self, key, spec, cls):
+        self.key = key
+        self.keyword = spec.get('keyword')
+        self.pattern = re.compile(spec['pattern'])
+        self.lexer = spec.get('lexer')
+        self.template = DocblockTemplate(spec['template'])
+
+        self.callbacks = {}
+        for name, callback in spec['callbacks'].items():
+            self.callbacks[name] = getattr(cls, callback)
+
+    def match(self, sig):
+        if self.lexer is None:
+            return self.pattern.match(sig)
+        return self.lexer(sig)
+
+
+class SignatureRegistry(object):
+    """
+    All compiled signatures for a single Docblock generator class.
+
+    Registries are built lazily, once per class, and shared by every
+    instance of that class. Use SignatureRegistry.forClass() rather than
+    creating them directly.
+
+    Signatures which declare a `keyword` are indexed by it: a single cheap
+    scan over the leading modifiers picks the candidate signatures for a
+    line, and lines which can't possibly match are rejected before any of
+    the full patterns run.
+    """
+
+    _registries = {}
+
+    def __init__(self, cls):
+        self.cls = cls
+
+        # keep the signatures in the same order as the opt dict, since the
+        # first signature to match wins.
+        signatures = cls.opt.get('signatures', {})
+        self.signatures = [Signature(k, s, cls) for k, s in signatures.items()]
+
+        self.dispatch = None
+        self.keywords = {}
+        self.fallback = [s for s in self.signatures if s.keyword is None]
+
+        keywords = set([s.keyword for s in self.signatures if s.keyword is not None])
+        if keywords:
+            for keyword in keywords:
+                self.keywords[keyword] = [s for s in self.signatures if s.keyword in (keyword, None)]
+
+            modifiers = cls.opt.get('modifiers', ())
+            self.dispatch = re.compile('\\s*(?:(?:%s)\\s+)*(%s)' % (
+                '|'.join([re.escape(m) for m in modifiers]) or '(?!)',
+                '|'.join([re.escape(k) for k in sorted(keywords, key=len, reverse=True)]),
+            ))
+
+        # type guessing for default values, see Docblock.guessType()
+        self.literals = LiteralClassifier(cls.opt.get('literals', ()))
+
+        # generated docblock cache, see Docblock.enableCache()
+        self.cache = None
+
+        self.formatters = {}
+
+        # the registry is shared by every instance of the class, and so by
+        # every thread using one: the dispatch counters are kept under a lock.
+        self.lock = threading.Lock()
+        self.resetStats()
+
+    @classmethod
+    def forClass(cls, docblock_class):
+        registry = cls._registries.get(docblock_class)
+        if registry is None:
+            registry = cls(docblock_class)
+            cls._registries[docblock_class] = registry
+        return registry
+
+    def formatter(self, opt, whitespace):
+        """
+        Get the (cached) formatter for these options and indentation.
+        """
+        key = (opt['prefix'], opt['infix'], opt['suffix'], opt['line_ending'], whitespace)
+
+        formatter = self.formatters.get(key)
+        if formatter is None:
+            if len(self.formatters) >= MAX_FORMATTERS:
+                self.formatters.clear()
+            formatter = DocblockFormatter(*key)
+            self.formatters[key] = formatter
+        return formatter
+
+    def candidates(self, sig):
+        """
+        Get the signatures worth trying for this line, in order.
+        """
+        rejected = False
+        if self.dispatch is None:
+            candidates = self.signatures
+        else:
+            result = self.dispatch.match(sig)
+            if result:
+                candidates = self.keywords[result.group(1)]
+            else:
+                candidates = self.fallback
+                rejected = not candidates
+
+        with self.lock:
+            self.lines += 1
+            if rejected:
+                self.rejected += 1
+        return candidates
+
+    def keyword(self, sig):
+        """
+        Get the declaration keyword this line starts with, if any.
+        """
+        if self.dispatch is None:
+            return
+
+        result = self.dispatch.match(sig)
+        with self.lock:
+            self.keyword_scans += 1
+        if result:
+            return result.group(1)
+
+    def stats(self):
+        """
+        Dispatch counters: lines seen by candidates(), lines rejected without
+        running any of the full signature patterns, and keyword() scans.
+        """
+        with self.lock:
+            return {'lines': self.lines, 'rejected': self.rejected, 'keyword_scans': self.keyword_scans}
+
+    def resetStats(self):
+        with self.lock:
+            self.lines = 0
+            self.rejected = 0
+            self.keyword_scans = 0
+
+    def __iter__(self):
+        return iter(self.signatures)
+
+    def __len__(self):
+        return len(self.signatures)
@@ -4,13 +4,53 @@ Utility functions for working with Coda Plugin Skeleton
 '''
 
 import re
-from types import StringTypes
 
-import AppKit
-from Foundation import *
+from operator import methodcaller
 
+try:
+    import AppKit
+    from Foundation import *
+except ImportError:
+    # no Cocoa here (i.e. running on a build server), use the headless backend
+    AppKit = None
+    from cp_headless import NSMakeRange, NSLog
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+    xrange = range
+
+import cp_entities as entities
 import cp_html_replace as html_replace
 import cp_html_matcher as html_matcher
+import cp_line_index as line_index
+from cp_snapshot import DocumentSnapshot
+
+# word characters for words_and_range(). include < and > for html, $ for php variables.
+WORD_CHARS = 'a-zA-Z0-9_\\?|`<>\\$'
+
+RE_NOT_WORD_CHAR = re.compile('[^%s]' % WORD_CHARS)
+RE_ENDS_WITH_NOT_WORD_CHAR = re.compile('[^%s]$' % WORD_CHARS)
+RE_LAST_NOT_WORD_CHAR = re.compile('([^%s])[%s]*$' % (WORD_CHARS, WORD_CHARS))
+
+# does a line end with a tag? includes ASP/PHP/JSP/ColdFusion closing delimiters
+RE_ENDS_WITH_TAG = re.compile(r'(<\/?[\w:\-]+[^>]*|\s*(\?|%|-{2,3}))>$')
+
+# is everything before a line's linebreaks whitespace? for trim(discard_empty=True)
+RE_BLANK = re.compile(r'\s*\Z')
+
+# how much of the document get_word() starts looking at either side of the cursor
+WORD_WINDOW = 256
+
+# get_word() word character patterns, by (alpha_numeric, extra_characters, unicode)
+_word_patterns = {}
+
+# (text, cursor, in style) for the last get_zen_doctype() check which needed the full matcher
+_last_style_check = None
+
+# trim() line functions, by (sides, indent, preserve_linebreaks, discard_empty)
+_trimmers = {}
 
 
 def is_line_ending(content, index, line_ending):
@@ -33,14 +73,15 @@ def get_line_before_and_range(context, range = None):
     line_ending = get_line_ending(context)
     if range is None: range = get_range(context)
     content = context.string()
+    index = line_index.for_context(context, content, line_ending)
 
-    end = content.rfind(line_ending, 0, range.location)
+    end = index.rfind(range.location)
     if end == -1:
         return None, range
     else:
         end = end + len(line_ending)
     
-    start = content.rfind(line_ending, 0, end - len(line_ending))
+    start = index.rfind(end - len(line_ending))
     if start == -1:
         start = 0
     else:
@@ -62,17 +103,18 @@ def get_line_after_and_range(context, range = None):
     len_line_ending = len(line_ending)
     if range is None: range = get_range(context)
     content = context.string()
+    index = line_index.for_context(context, content, line_ending)
     
     start = range.location + range.length
     
     if not is_line_ending(content, start - len_line_ending, line_ending):
-        start = content.find(line_ending, start)
+        start = index.find(start)
         if start == -1:
             return None, range
         else:
             start += len_line_ending
     
-    end = content.find(line_ending, start)
+    end = index.find(start)
     if end == -1:
         end = len(content)
     else:
@@ -84,17 +126,52 @@ def get_line_after_and_range(context, range = None):
     
     return get_selection(context, line_range), line_range
 
+def iter_lines_after_and_range(context, range = None):
+    '''
+    Generate the full lines after the current (or supplied) range, with their
+    ranges, from the first line get_line_after_and_range would return
+
+    The document is only fetched once, however many lines are read.
+    '''
+    line_ending = get_line_ending(context)
+    len_line_ending = len(line_ending)
+    if range is None: range = get_range(context)
+    content = context.string()
+    index = line_index.for_context(context, content, line_ending)
+    length = len(content)
+
+    start = range.location + range.length
+
+    if not is_line_ending(content, start - len_line_ending, line_ending):
+        start = index.find(start)
+        if start == -1:
+            return
+        start += len_line_ending
+
+    start = max(0, start)
+    while start < length:
+        end = index.find(start)
+        if end == -1:
+            end = length
+        else:
+            end += len_line_ending
+
+        line_range = new_range(start, end - start)
+        yield content.substringWithRange_(line_range), line_range
+        start = end
+
 def lines_and_range(context, range = None):
     '''Get the range of the full lines containing the current (or supplied) range'''
     line_ending = get_line_ending(context)
     len_line_ending = len(line_ending)
     if range is None: range = get_range(context)
     content = context.string()
+    index = line_index.for_context(context, content, line_ending)
     
     start, end = range.location, range.location + range.length
     
     if not is_line_ending(content, start - len_line_ending, line_ending):
-        start = content.rfind(line_ending, 0, start)
+        start = index.rfind(start)
         if start == -1:
             start = 0
         else:
@@ -103,16 +180,16 @@ def lines_and_range(context, range = None):
     # select to the end of the line (if it's not already selected)
     if not is_line_ending(content, end, line_ending):
         # edge case: cursor is at start of line and more than one line selected:
-        if not is_line_ending(content, end - len_line_ending, line_ending) or len(content[start:end].split(line_ending)) <= 1:
-            end = content.find(line_ending, end)
+        if not is_line_ending(content, end - len_line_ending, line_ending) or index.find(start, end) == -1:
+            end = index.find(end)
             if end == -1:
                 end = len(content)
             else:
                 end += len_line_ending
     # edge case: empty line, not selected
     elif is_line_ending(content, end - len_line_ending, line_ending):
-        if len(content[start:end].split(line_ending)) <= 1:
-            end = content.find(line_ending, end)
+        if index.find(start, end) == -1:
+            end = index.find(end)
             if end == -1:
                 end = len(content)
             else:
@@ -170,9 +247,6 @@ def extract_insertion_point_range(text):
 def words_and_range(context, range = None):
     '''Get text and range for the current word(s)'''
     
-    # word characters, for our purposes. include < and > for html, $ for php variables.
-    word_chars = 'a-zA-Z0-9_\\?|`<>\$'
-    
     line_ending = get_line_ending(context)
     text = context.string()
     line_text, line_range = lines_and_range(context)
@@ -186,10 +260,10 @@ def words_and_range(context, range = None):
     # move the start (out)
     prefix_start = line_range.location
     prefix_end = selection_range.location
-    if prefix_end > prefix_start and not re.match('[^%s]' % word_chars, selection):
-        result = rfind_not_chars(text[prefix_start:prefix_end], word_chars)
-        if result != -1:
-            start = prefix_start + result
+    if prefix_end > prefix_start and not RE_NOT_WORD_CHAR.match(selection):
+        result = RE_LAST_NOT_WORD_CHAR.search(text, prefix_start, prefix_end)
+        if result:
+            start = result.end(1)
         else:
             start = prefix_start
         
@@ -198,10 +272,10 @@ def words_and_range(context, range = None):
 
     suffix_start = selection_range.location + selection_range.length
     suffix_end = line_range.location + line_range.length
-    if suffix_start < suffix_end and not re.search('[^%s]$' % word_chars, selection):
-        result = find_not_chars(text[suffix_start:suffix_end], word_chars)
-        if result != -1:
-            end = result + suffix_start
+    if suffix_start < suffix_end and not RE_ENDS_WITH_NOT_WORD_CHAR.search(selection):
+        result = RE_NOT_WORD_CHAR.search(text, suffix_start, suffix_end)
+        if result:
+            end = result.start()
         else:
             end = suffix_end
         
@@ -213,7 +287,8 @@ def words_and_range(context, range = None):
 
 def beep():
     '''System beep!'''
-    AppKit.NSBeep()
+    if AppKit is not None:
+        AppKit.NSBeep()
 
 
 def find_chars(text, chars):
@@ -270,6 +345,10 @@ def rfind_not_chars(text, chars):
 def say(context, title, message,
         main_button=None, alt_button=None, other_button=None):
     '''Displays a dialog with a message for the user'''
+    if AppKit is None:
+        log('%s: %s' % (title, message))
+        return
+    
     alert = NSAlert.alertWithMessageText_defaultButton_alternateButton_otherButton_informativeTextWithFormat_(
         title,
         main_button,
@@ -306,10 +385,26 @@ def get_option(options, option, default=None):
 def get_context(controller, sender=None):
     return controller.focusedTextView_(sender)
 
+def get_snapshot(controller, sender=None):
+    '''
+    Get the context wrapped in a DocumentSnapshot, which only fetches the
+    document text, line ending and so on once for the whole action
+    '''
+    return DocumentSnapshot(get_context(controller, sender))
+
 # ===============================================================
 # Preference lookup shortcuts
 # ===============================================================
 
+def get_file_extension(context):
+    '''Shortcut to get the (lowercase) file extension for the context, if any'''
+    path = context.path()
+    if path is not None:
+        pos = path.rfind('.')
+        if pos != -1:
+            return path[pos+1:].lower()
+    return None
+
 def get_line_ending(context):
     '''Shortcut function to get the line-endings for the context'''
     return context.lineEnding()
@@ -383,32 +478,18 @@ def encode_ampersands(text, enc='&amp;'):
 
 def named_entities(text):
     '''Converts Unicode characters into named HTML entities'''
-    text = text.encode('ascii', 'html_replace')
-    return encode_ampersands(text)
+    return entities.transcoder('named', entities=False, ampersands='named').transcode(text).encode('ascii')
 
 def numeric_entities(text, ampersands=None):
     '''Converts Unicode characters into numeric HTML entities'''
-    text = text.encode('ascii', 'xmlcharrefreplace')
-    if ampersands == 'numeric':
-        return encode_ampersands(text, '&#38;')
-    elif ampersands == 'named':
-        return encode_ampersands(text)
-    else:
-        return text
+    return entities.transcoder('numeric', entities=False, ampersands=ampersands).transcode(text).encode('ascii')
 
 def entities_to_hex(text, wrap):
     '''
     Converts HTML entities into hexadecimal; replaces $HEX in wrap
     with the hex code
     '''
-    # This is a bit of a hack to make the variable available to the function
-    wrap = [wrap]
-    def wrap_hex(match):
-        hex = '%X' % int(match.group(2))
-        while len(hex) < 4:
-            hex = '0' + hex
-        return wrap[0].replace('$HEX', hex)
-    return re.sub(r'&(#x?)?([0-9]+|[0-9a-fA-F]+);', wrap_hex, text)
+    return entities.transcoder('hex', wrap, raw=False).transcode(text)
 
 def trim(context, text, lines=True, sides='both', respect_indent=False,
          preserve_linebreaks=True, discard_empty=False):
@@ -425,49 +506,59 @@ def trim(context, text, lines=True, sides='both', respect_indent=False,
     If discard_empty=True, whitespace on empty lines will be discarded
     regardless of indentation status
     '''
-    def trimit(text, sides, indent, preserve_linebreaks, discard_empty):
-        '''Utility function for trimming the text'''
-        # If we're discarding empties, check for empty line
-        if discard_empty:
-            match = re.match(r'\s*?([\n\r]+)$', text)
-            if match:
-                return match.group(1)
-        # Preserve the indent if an indent string is passed in
-        if (sides.lower() == 'both' or sides.lower() == 'start') and indent != '':
-            match = re.match('(' + indent + ')+', text)
-            if match:
-                indent_chars = match.group(0)
-            else:
-                indent_chars = ''
-        else:
-            indent_chars = ''
-        # Preserve the linebreaks at the end if needed
-        match = re.search(r'[\n\r]+$', text)
-        if match and preserve_linebreaks:
-            linebreak = match.group(0)
-        else:
-            linebreak = ''
-        # Strip that whitespace!
-        if sides.lower() == 'start':
-            text = text.lstrip()
-        elif sides.lower() == 'end':
-            text = text.rstrip()
-        else:
-            text = text.strip()
-        return indent_chars + text + linebreak
-    
     # Set up which characters to treat as indent
     if respect_indent:
         indent = get_indentation_string(context)
     else:
         indent = ''
-    finaltext = ''
+    trimit = _trimmer(sides, indent, preserve_linebreaks, discard_empty)
     if lines:
-        for line in text.splitlines(True):
-            finaltext += trimit(line, sides, indent, preserve_linebreaks, discard_empty)
+        return ''.join(map(trimit, text.splitlines(True)))
     else:
-        finaltext = trimit(text, sides, indent, preserve_linebreaks, discard_empty)
-    return finaltext
+        return trimit(text)
+
+def _trimmer(sides, indent, preserve_linebreaks, discard_empty):
+    '''The (cached) function trim() runs on each line for a set of options'''
+    key = (sides, indent, preserve_linebreaks, discard_empty)
+    trimit = _trimmers.get(key)
+    if trimit is not None:
+        return trimit
+
+    sides = sides.lower()
+    if sides == 'start':
+        strip = methodcaller('lstrip')
+    elif sides == 'end':
+        strip = methodcaller('rstrip')
+    else:
+        strip = methodcaller('strip')
+    # Preserve the indent if an indent string is passed in
+    if (sides == 'both' or sides == 'start') and indent != '':
+        match_indent = re.compile('(' + indent + ')+').match
+    else:
+        match_indent = None
+    is_blank = RE_BLANK.match
+
+    def trimit(text):
+        '''Utility function for trimming the text'''
+        # the linebreaks at the end are the same run [\n\r]+$ would find
+        content = text.rstrip('\r\n')
+        linebreak = text[len(content):]
+        # If we're discarding empties, check for empty line
+        if discard_empty and linebreak and is_blank(content):
+            return linebreak
+        indent_chars = ''
+        if match_indent is not None:
+            match = match_indent(text)
+            if match:
+                indent_chars = match.group(0)
+        # Preserve the linebreaks at the end if needed
+        if not preserve_linebreaks:
+            linebreak = ''
+        # Strip that whitespace!
+        return indent_chars + strip(text) + linebreak
+
+    _trimmers[key] = trimit
+    return trimit
 
 def unix_line_endings(text):
     '''Converts all line endings to Unix'''
@@ -519,7 +610,7 @@ def selection_and_range(context, with_errors=False):
     Returns a tuple with the selected text first and its range second
     '''
     range = context.selectedRange()
-    if range.length is 0:
+    if range.length == 0:
         if with_errors:
             say(
                 context, "Error: selection required",
@@ -548,77 +639,90 @@ def get_word(context, range, alpha_numeric=True, extra_characters='_-',
     
     If bidirectional is False, then it will only look behind the cursor
     '''
-    # Helper regex for determining if line ends with a tag
-    # Includes checks for ASP/PHP/JSP/ColdFusion closing delimiters
-    re_tag = re.compile(r'(<\/?[\w:\-]+[^>]*|\s*(\?|%|-{2,3}))>$')
-    
-    def test_word():
-        # Mini-function to cut down on code bloat
-        if alpha_numeric:
-            return all(c.isalnum() or c in extra_characters for c in char)
-        else:
-            return all(char.isalpha() or c in extra_characters for c in char)
+    location = range.location
+    maxlength = context.string().length()
     
-    def ends_with_tag(cur_index):
-        # Mini-function to check if line to index ends with a tag
-        linestart = context.rangeOfCurrentLine().location
-        text = get_selection(
-            context, new_range(linestart, cur_index - linestart + 1)
-        )
-        return re_tag.search(text) != None
+    # fetch a window of text around the cursor, and widen it until it holds
+    # the whole word (which it almost always will first time)
+    size = WORD_WINDOW
+    while True:
+        start = max(0, location - size)
+        end = min(maxlength, location + size)
+        window = get_selection(context, new_range(start, end - start))
+        offset = location - start
+        
+        pattern = _word_pattern(alpha_numeric, extra_characters, isinstance(window, text_type))
+        
+        after = 0
+        if bidirectional and location != maxlength:
+            after = _word_run(pattern, window, offset, alpha_numeric, extra_characters)
+        
+        before = 0
+        if offset > 0:
+            before = _word_run(pattern, window[offset-1::-1], 0, alpha_numeric, extra_characters)
+        
+        if (end == maxlength or offset + after < len(window)) and (start == 0 or before < offset):
+            break
+        size *= 4
+    
+    if '>' in extra_characters:
+        # don't walk back past the end of a tag
+        linestart = None
+        index = window.rfind('>', offset - before, offset)
+        while index != -1:
+            if linestart is None:
+                linestart = context.rangeOfCurrentLine().location
+            if linestart >= start:
+                line = window[linestart - start:index + 1]
+            else:
+                line = get_selection(context, new_range(linestart, start + index - linestart + 1))
+            if RE_ENDS_WITH_TAG.search(line) is not None:
+                before = offset - index - 1
+                break
+            index = window.rfind('>', offset - before, index)
+    
+    word = window[offset - before:offset + after]
+    firstindex = location - before
     
-    # Set up basic variables
-    index = range.location
-    word = ''
-    maxlength = context.string().length()
     if bidirectional:
-        # Make sure the cursor isn't at the end of the document
-        if index != maxlength:
-            # Check if cursor is mid-word
-            char = get_selection(context, new_range(index, 1))
-            if test_word():
-                inword = True
-                # Parse forward until we hit the end of word or document
-                while inword:
-                    char = get_selection(context, new_range(index, 1))
-                    if test_word():
-                        word += char
-                    else:
-                        inword = False
-                    index += 1
-                    if index == maxlength:
-                        inword = False
-            else:
-                # lastindex logic assumes we've been incrementing as we go,
-                # so bump it up one to compensate
-                index += 1
-        lastindex = index - 1 if index < maxlength else index
+        # the end of the range is just past the word, or the character after
+        # the cursor if it's not in a word. at the end of the document, it's
+        # the end of the document.
+        lastindex = location + after
+        if lastindex != maxlength and lastindex + 1 == maxlength:
+            lastindex = maxlength
     else:
         # Only parsing backward, so final index is cursor
-        lastindex = range.location
-    # Reset index to one less than the cursor
-    index = range.location - 1
-    # Only walk backwards if we aren't at the beginning
-    if index >= 0:
-        # Parse backward to get the word ahead of the cursor
-        inword = True
-        while inword:
-            char = get_selection(context, new_range(index, 1))
-            if test_word() and not (char == '>' and ends_with_tag(index)):
-                word = char + word
-                index -= 1
-            else:
-                inword = False
-            if index < 0:
-                inword = False
-    # Since index is left-aligned and we've overcompensated,
-    # need to increment +1
-    firstindex = index + 1
-    # Switch last index to length for use in range
-    lastindex = lastindex - firstindex
-    range = new_range(firstindex, lastindex)
+        lastindex = location
+    
+    range = new_range(firstindex, lastindex - firstindex)
     return word, range
 
+def _word_pattern(alpha_numeric, extra_characters, unicode_text):
+    '''The (cached) pattern matching a run of get_word() word characters'''
+    key = (alpha_numeric, extra_characters, unicode_text)
+    pattern = _word_patterns.get(key)
+    if pattern is None:
+        # \w is anything isalnum(), plus _
+        chars = r'[^\W_]' if alpha_numeric else r'[^\W\d_]'
+        if extra_characters:
+            chars = '(?:%s|[%s])' % (chars, re.escape(extra_characters))
+        pattern = re.compile(chars + '*', re.UNICODE if unicode_text else 0)
+        _word_patterns[key] = pattern
+    return pattern
+
+def _word_run(pattern, text, pos, alpha_numeric, extra_characters):
+    '''The length of the run of word characters in text at pos'''
+    length = pattern.match(text, pos).end() - pos
+    if not alpha_numeric:
+        # there are a handful of numeric characters \d doesn't cover, but
+        # which aren't isalpha() either
+        for i in xrange(pos, pos + length):
+            c = text[i]
+            if not (c.isalpha() or c in extra_characters):
+                return i - pos
+    return length
+
 def get_word_or_selection(context, range, alpha_numeric=True,
                           extra_characters='_-', bidirectional=True):
     '''
@@ -655,7 +759,7 @@ def indent_snippet(context, snippet, range):
                 lines = snippet.splitlines(True)
                 # Convert to iterator so we can avoid processing item 0
                 lines = iter(lines)
-                snippet = lines.next()
+                snippet = next(lines)
                 for line in lines:
                     snippet += current_indent + line
                 if re.search(r'[\n\r]$', snippet) is not None:
@@ -690,27 +794,65 @@ def get_zen_doctype(context, default='html'):
         range = get_range(context)
         cursor = range.location + range.length
         content = context.string()
-        start, end = html_matcher.match(content, cursor)
-        tag = html_matcher.last_match['opening_tag']
-        if tag is not None:
-            tag = tag.name
-            if tag == 'style':
-                doc_type = 'css'
+        if in_style(content, cursor):
+            doc_type = 'css'
     return doc_type
 
+def in_style(content, cursor):
+    '''
+    Checks whether the cursor is inside a <style> tag
+
+    The text around the cursor usually settles it; the document is only
+    matched in full (and the answer kept for the same text and cursor)
+    when it doesn't.
+    '''
+    global _last_style_check
+
+    inside = html_matcher.is_inside(content, cursor, 'style')
+    if inside is not None:
+        return inside
+
+    last = _last_style_check
+    if last is not None and last[1] == cursor and (last[0] is content or last[0] == content):
+        return last[2]
+
+    html_matcher.match(content, cursor)
+    tag = html_matcher.last_match['opening_tag']
+    inside = tag is not None and tag.type == 'tag' and tag.name == 'style'
+    _last_style_check = (content, cursor, inside)
+    return inside
+
 # ===============================================================
 # Insertion methods
 # ===============================================================
 
 def insert_text(context, text, range):
     '''Immediately replaces the text at range with passed in text'''
+    index = line_index.cached(context)
     context.beginUndoGrouping()
     context.replaceCharactersInRange_withString_(range, text)
     context.endUndoGrouping()
+    line_index.edited(context, index, [(range, text)])
+
+def insert_texts(context, insertions):
+    '''
+    Replaces each (range, text) pair in insertions, all in one undo group
+    
+    Ranges are relative to the original document and must not overlap.
+    '''
+    index = line_index.cached(context)
+    context.beginUndoGrouping()
+    # work from the end of the document up, so nothing shifts underneath us
+    for range, text in sorted(insertions, key=lambda i: i[0].location, reverse=True):
+        context.replaceCharactersInRange_withString_(range, text)
+    context.endUndoGrouping()
+    line_index.edited(context, index, insertions)
 
 def insert_text_and_select(context, text, range, select_range):
     '''Immediately inserts the text and selects the given range'''
+    index = line_index.cached(context)
     context.beginUndoGrouping()
     context.replaceCharactersInRange_withString_(range, text)
     context.setSelectedRange_(select_range)
     context.endUndoGrouping()
+    line_index.edited(context, index, [(range, text)])
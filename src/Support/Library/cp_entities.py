@@ -0,0 +1,207 @@
+'''
+Converts text between raw characters, named HTML entities, decimal numeric
+entities and wrapped hex codes
+
+A Transcoder is set up once for the form it converts to, and rewrites the
+entities and stray ampersands in a string in a single regular expression
+pass (a plain substitution when entities are left alone). Raw (non-ASCII)
+characters go through a cp_html_replace lookup table with
+unicode.translate(), so they never call back into Python.
+
+Usage:
+import cp_entities as entities
+to_hex = entities.transcoder('hex', wrap='\\$HEX', raw=False)
+text = to_hex.transcode(text)
+for chunk in to_hex.itertranscode(chunks):
+    ...
+'''
+
+import re
+
+import cp_html_replace as html_replace
+
+try:
+    import htmlentitydefs as html
+except ImportError:
+    import html.entities as html
+
+try:
+    unichr
+except NameError:
+    unichr = chr
+
+TARGETS = ('raw', 'named', 'numeric', 'hex')
+
+# what stray ampersands are replaced with
+AMPERSANDS = {
+    'named': '&amp;',
+    'numeric': '&#38;',
+}
+
+# an entity (decimal, hex or named; the name group also takes anything
+# encode_ampersands() would leave alone, like &123;) or a stray ampersand
+RE_TOKEN = re.compile(r'&(?:#([0-9]+)|#([xX])([0-9a-fA-F]+)|([a-zA-Z0-9]+));|&')
+
+# just the stray ampersands, for when entities are left as they are
+RE_AMPERSAND = re.compile(r'&(?!(?:[a-zA-Z0-9]+|#[0-9]+|#x[0-9a-fA-F]+);)')
+
+# the end of a chunk that may be cut off in the middle of an entity
+RE_PARTIAL = re.compile(r'&#?[0-9a-zA-Z]*\Z')
+
+# characters transcoded at a time by itertranscode()
+CHUNK_SIZE = html_replace.CHUNK_SIZE
+
+
+class HexTable(html_replace.EntityTable):
+    '''
+    An EntityTable that replaces every non-ASCII character with wrap, with
+    $HEX in it replaced by the character's code point in hex (at least
+    four digits)
+    '''
+
+    def __init__(self, wrap):
+        html_replace.EntityTable.__init__(self)
+        self.wrap = wrap
+
+    def __missing__(self, code):
+        entity = self.wrap.replace('$HEX', '%04X' % code)
+        self[code] = entity
+        return entity
+
+
+def to_char(code):
+    '''The character for a code point, as a surrogate pair on narrow builds'''
+    if code > 0xFFFF and html_replace.NARROW:
+        code -= 0x10000
+        return unichr(0xD800 + (code >> 10)) + unichr(0xDC00 + (code & 0x3FF))
+    return unichr(code)
+
+
+class Transcoder(object):
+    '''
+    Converts entities, raw characters and stray ampersands to one target:
+
+    raw: entities become the characters they stand for
+    named: entities and characters become named entities where there's a
+        name, and decimal ones otherwise
+    numeric: decimal entities
+    hex: wrap, with $HEX replaced by the code point in hex
+
+    raw=False leaves non-ASCII characters alone, and entities=False leaves
+    existing entities alone. ampersands is 'named' or 'numeric' to encode
+    ampersands that don't start an entity, the same way encode_ampersands()
+    does in cp_actions.
+    '''
+
+    def __init__(self, target, wrap='$HEX', raw=True, entities=True, ampersands=None):
+        if target not in TARGETS:
+            raise ValueError('Unknown target %r' % target)
+        self.target = target
+        self.wrap = wrap
+        self.entities = entities
+        self.ampersand = AMPERSANDS.get(ampersands, '&')
+
+        if not raw or target == 'raw':
+            self.table = None
+        elif target == 'named':
+            self.table = html_replace.NAMED
+        elif target == 'numeric':
+            self.table = html_replace.NUMERIC
+        else:
+            self.table = HexTable(wrap)
+
+        # entities in the target form, by code point
+        self.converted = {}
+
+    def convert(self, code):
+        '''The target form of a code point, or None if it has none'''
+        converted = self.converted.get(code)
+        if converted is None:
+            if self.target == 'hex':
+                converted = self.wrap.replace('$HEX', '%04X' % code)
+            elif code > 0x10FFFF:
+                return None
+            elif self.target == 'raw':
+                converted = to_char(code)
+            elif self.target == 'named' and code in html.codepoint2name:
+                converted = '&%s;' % html.codepoint2name[code]
+            else:
+                converted = '&#%d;' % code
+            self.converted[code] = converted
+        return converted
+
+    def _token(self, match):
+        decimal, x, digits, name = match.groups()
+        if decimal is not None:
+            code = int(decimal)
+        elif digits is not None:
+            code = int(digits, 16)
+        elif name is not None:
+            code = html.name2codepoint.get(name)
+        else:
+            return self.ampersand
+
+        if self.entities and code is not None:
+            converted = self.convert(code)
+            if converted is not None:
+                return converted
+        if x == 'X':
+            # encode_ampersands() only takes &#x for a hex entity
+            return self.ampersand + match.group(0)[1:]
+        return match.group(0)
+
+    def transcode(self, text):
+        '''Convert text to the target form'''
+        if self.entities:
+            text = RE_TOKEN.sub(self._token, text)
+        elif self.ampersand != '&':
+            text = RE_AMPERSAND.sub(self.ampersand, text)
+
+        if self.table is html_replace.NUMERIC:
+            # the codec's own handler is quicker than any table
+            text = text.encode('ascii', 'xmlcharrefreplace').decode('ascii')
+        elif self.table is not None:
+            text = self.table.translate(text)
+        return text
+
+    def itertranscode(self, chunks):
+        '''
+        Transcode an iterable of strings (or one long string, CHUNK_SIZE
+        characters at a time), yielding the converted chunks
+
+        Entities and surrogate pairs split between chunks are held back and
+        converted with the next one.
+        '''
+        if isinstance(chunks, html_replace.string_types):
+            text = chunks
+            chunks = (text[i:i + CHUNK_SIZE] for i in range(0, len(text), CHUNK_SIZE))
+
+        pending = ''
+        for chunk in chunks:
+            if pending:
+                chunk = pending + chunk
+                pending = ''
+            i = chunk.rfind('&')
+            if i != -1 and RE_PARTIAL.match(chunk, i):
+                pending = chunk[i:]
+                chunk = chunk[:i]
+            elif html_replace.NARROW and chunk and u'\ud800' <= chunk[-1] <= u'\udbff':
+                pending = chunk[-1]
+                chunk = chunk[:-1]
+            if chunk:
+                yield self.transcode(chunk)
+
+        if pending:
+            yield self.transcode(pending)
+
+
+# transcoders already set up, by their arguments
+_transcoders = {}
+
+
+def transcoder(target, wrap='$HEX', raw=True, entities=True, ampersands=None):
+    '''Get a Transcoder for the given arguments, reusing one if possible'''
+    key = (target, wrap, raw, entities, ampersands)
+    if key not in _transcoders:
+        _transcoders[key] = Transcoder(target, wrap, raw, entities, ampersands)
+    return _transcoders[key]
@@ -0,0 +1,198 @@
+'''
+Headless stand-ins for the Cocoa and Coda objects used by cp_actions
+
+Lets the Docblock generators and the line utilities run on a plain Python
+interpreter (i.e. on a Linux build server), without AppKit or Foundation.
+
+Usage:
+import cp_headless
+context = cp_headless.TextContext(source, line_ending='\n', path='foo.php')
+text, range = cp_actions.lines_and_range(context)
+'''
+
+import sys
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+
+class Range(object):
+    '''Pure Python NSRange'''
+    __slots__ = ('location', 'length')
+
+    def __init__(self, location, length):
+        self.location = location
+        self.length = length
+
+    def __eq__(self, other):
+        return self.location == other.location and self.length == other.length
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __iter__(self):
+        return iter((self.location, self.length))
+
+    def __repr__(self):
+        return 'Range(%d, %d)' % (self.location, self.length)
+
+
+def NSMakeRange(location, length):
+    '''Stand-in for Foundation.NSMakeRange'''
+    return Range(location, length)
+
+
+def NSLog(message):
+    '''Stand-in for Foundation.NSLog; logs to stderr'''
+    sys.stderr.write('%s\n' % message)
+
+
+class _StringMethods(object):
+    '''The NSString methods cp_actions expects from context.string()'''
+
+    def substringWithRange_(self, range):
+        return self[range.location:range.location + range.length]
+
+    def length(self):
+        return len(self)
+
+
+class _HeadlessString(_StringMethods, str):
+    pass
+
+
+class _HeadlessText(_StringMethods, text_type):
+    pass
+
+
+def headless_string(text):
+    '''Wrap text so it quacks like a (bridged) NSString'''
+    if isinstance(text, _StringMethods):
+        return text
+    elif isinstance(text, text_type):
+        return _HeadlessText(text)
+    else:
+        return _HeadlessString(text)
+
+
+class TextContext(object):
+    '''
+    In-memory document implementing the CodaTextView methods used by
+    cp_actions and the plugin actions
+    '''
+
+    def __init__(self, text, line_ending='\n', path=None, selected_range=None,
+                 uses_tabs=False, tab_width=4):
+        self.text = headless_string(text)
+        self.line_ending = line_ending
+        self.file_path = path
+        self.selected_range = selected_range or Range(0, 0)
+        self.uses_tabs = uses_tabs
+        self.tab_width = tab_width
+        self.undo_depth = 0
+
+    def string(self):
+        return self.text
+
+    def stringWithRange_(self, range):
+        return self.text.substringWithRange_(range)
+
+    def lineEnding(self):
+        return self.line_ending
+
+    def path(self):
+        return self.file_path
+
+    def window(self):
+        return None
+
+    def usesTabs(self):
+        return self.uses_tabs
+
+    def tabWidth(self):
+        return self.tab_width
+
+    def selectedRange(self):
+        return self.selected_range
+
+    def setSelectedRange_(self, range):
+        self.selected_range = range
+
+    def selectedText(self):
+        return self.text.substringWithRange_(self.selected_range)
+
+    def startOfLine(self):
+        start = self.text.rfind(self.line_ending, 0, self.selected_range.location)
+        if start == -1:
+            return 0
+        return start + len(self.line_ending)
+
+    def rangeOfCurrentLine(self):
+        start = self.startOfLine()
+        end = self.text.find(self.line_ending, start)
+        if end == -1:
+            end = len(self.text)
+        return Range(start, end - start)
+
+    def currentLine(self):
+        return self.text.substringWithRange_(self.rangeOfCurrentLine())
+
+    def replaceCharactersInRange_withString_(self, range, text):
+        end = range.location + range.length
+        self.text = headless_string(self.text[:range.location] + text + self.text[end:])
+        self.selected_range = Range(range.location + len(text), 0)
+
+    def insertText_(self, text):
+        self.replaceCharactersInRange_withString_(self.selected_range, text)
+
+    def beginUndoGrouping(self):
+        self.undo_depth += 1
+
+    def endUndoGrouping(self):
+        self.undo_depth -= 1
+
+
+class CountingContext(object):
+    '''
+    Wraps a context, counting the calls made to each of its methods (i.e.
+    the trips a real context would make across the bridge)
+    '''
+
+    def __init__(self, context):
+        self.context = context
+        self.calls = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self.context, name)
+        if not callable(attr):
+            return attr
+
+        def method(*args):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return attr(*args)
+        return method
+
+    def total(self):
+        return sum(self.calls.values())
+
+
+class Options(dict):
+    '''Plugin action options, as an NSDictionary would provide them'''
+
+    def objectForKey_(self, key):
+        return self.get(key)
+
+
+class Controller(object):
+    '''Plugin controller with a single focused document'''
+
+    def __init__(self, context):
+        self.context = context
+
+    def focusedTextView_(self, sender=None):
+        return self.context
+
+    def focusedTextView(self):
+        return self.context
@@ -10,14 +10,36 @@ starts and ends. If pair wasn't found, <code>None</code> will be returned.
 The last matched (or unmatched) result is saved in <code>last_match</code> 
 dictionary for later use.
 
+The tags and comments in a document are indexed the first time it's
+searched (see TagIndex), so further searches of the same document only
+look at its tags, not at every character. When the document changes,
+only the tags around the change are read again.
+
 @author: Sergey Chikuyonok (serge.che@gmail.com)
 '''
 import re
 
+from bisect import bisect_left, bisect_right
+
 start_tag = r'<([\w\:\-]+)((?:\s+[\w\-:]+(?:\s*=\s*(?:(?:"[^"]*")|(?:\'[^\']*\')|[^>\s]+))?)*)\s*(\/?)>'
 end_tag = r'<\/([\w\:\-]+)[^>]*>'
 attr = r'([\w\-:]+)(?:\s*=\s*(?:(?:"((?:\\.|[^"])*)")|(?:\'((?:\\.|[^\'])*)\')|([^>\s]+)))?'
 
+start_tag_re = re.compile(start_tag)
+end_tag_re = re.compile(end_tag)
+
+# anything that might start a tag or comment, or end a comment
+token_re = re.compile(r'<|-(?=->)')
+
+# token kinds
+OPEN, CLOSE, COMMENT_START, COMMENT_END = range(4)
+
+# characters compared at a time when looking for what's changed in a document
+BLOCK = 65536
+
+# how far either side of a position is_inside() looks before giving up
+WINDOW = 4096
+
 "Last matched HTML pair"
 last_match = {
 	'opening_tag': None, # Tag() or Comment() object
@@ -121,6 +143,544 @@ def save_match(opening_tag=None, closing_tag=None, ix=0):
 	
 	return last_match['start_ix'] != -1 and (last_match['start_ix'], last_match['end_ix']) or (None, None)
 
+class Offsets():
+	"""
+	Sorted positions in a document, which can be moved past an edit
+	without going through all of them: the ones from shift_from on are
+	stored `shift` short of where they are now, so an edit only has to
+	fix up the ones between it and the previous edit.
+	"""
+	def __init__(self, positions):
+		"""
+		@type positions: list
+		"""
+		self.items = positions
+		self.shift_from = len(positions)
+		self.shift = 0
+	
+	def __len__(self):
+		return len(self.items)
+	
+	def __getitem__(self, i):
+		if i >= self.shift_from:
+			return self.items[i] + self.shift
+		return self.items[i]
+	
+	def bisect_left(self, ix):
+		"""
+		Number of positions before ix
+		"""
+		i = bisect_left(self.items, ix, 0, self.shift_from)
+		if i < self.shift_from:
+			return i
+		return bisect_left(self.items, ix - self.shift, self.shift_from)
+	
+	def bisect_right(self, ix):
+		"""
+		Number of positions at or before ix
+		"""
+		i = bisect_right(self.items, ix, 0, self.shift_from)
+		if i < self.shift_from:
+			return i
+		return bisect_right(self.items, ix - self.shift, self.shift_from)
+	
+	def replace(self, start, end, positions, delta):
+		"""
+		Replace the positions from <code>start</code> up to <code>end</code>
+		with <code>positions</code>, and move the ones after them by
+		<code>delta</code>
+		@return: tuple, the indexes of the positions replaced
+		"""
+		i1 = self.bisect_left(start)
+		i2 = self.bisect_left(end)
+		
+		items = self.items
+		shift = self.shift
+		if not shift:
+			pass
+		elif i2 > self.shift_from:
+			items[self.shift_from:i2] = [ix + shift for ix in items[self.shift_from:i2]]
+		elif i2 < self.shift_from:
+			items[i2:self.shift_from] = [ix - shift for ix in items[i2:self.shift_from]]
+		
+		items[i1:i2] = positions
+		self.shift_from = i1 + len(positions)
+		self.shift += delta
+		return i1, i2
+	
+	def to_list(self):
+		return [self[i] for i in range(len(self))]
+
+class TagIndex():
+	"""
+	Every opening tag, closing tag, comment start and comment end in a
+	document, in document order, and where a pair search would end up
+	from each of them.
+	
+	The tokens are found in one pass over the document. The tables of
+	where searches end up are filled in as searches need them, so a
+	search costs a couple of binary searches and a jump per unclosed tag
+	between the position and its pair once they're there.
+	
+	When the document is edited, update() re-reads only the tokens
+	around the change, and drops only the table entries which may depend
+	on it: a search next to the edit fills them in again, a search far
+	away from it fills in the ones in between.
+	
+	Set TagIndex.check to rebuild the index from scratch after every
+	update and raise a ValueError if the updated one doesn't match (i.e.
+	in tests).
+	"""
+	check = False
+	
+	def __init__(self, html):
+		"""
+		@type html: str
+		@param html: Code to index
+		"""
+		self.html = html
+		
+		# Tag() for tags, length (as _find_pair() sees it) for comment starts
+		positions, self.kinds, self.items, comment_starts, comment_ends = self._tokenize(0, len(html))
+		self.positions = Offsets(positions)
+		self.comment_starts = Offsets(comment_starts)
+		self.comment_ends = Offsets(comment_ends)
+		self._measure_comments(0, len(self.kinds))
+		self._reset_tables()
+	
+	def _tokenize(self, start, end):
+		"""
+		Find the tokens starting from <code>start</code> up to <code>end</code>
+		"""
+		html = self.html
+		positions = []
+		kinds = []
+		items = []
+		comment_starts = []
+		comment_ends = []
+		
+		for m in token_re.finditer(html, start):
+			ix = m.start()
+			if ix >= end:
+				break
+			
+			if m.group(0) == '-':
+				kind, item = COMMENT_END, None
+				comment_ends.append(ix)
+			else:
+				tag = end_tag_re.match(html, ix)
+				if tag:
+					kind, item = CLOSE, Tag(tag, ix)
+				else:
+					tag = start_tag_re.match(html, ix)
+					if tag:
+						kind, item = OPEN, Tag(tag, ix)
+					elif html.startswith('<!--', ix):
+						kind, item = COMMENT_START, None
+						comment_starts.append(ix)
+					else:
+						continue
+			
+			positions.append(ix)
+			kinds.append(kind)
+			items.append(item)
+		
+		return positions, kinds, items, comment_starts, comment_ends
+	
+	def _measure_comments(self, start, end):
+		"""
+		Work out the length of the comments started by tokens
+		<code>start</code> to <code>end</code>: a comment runs to the first
+		`-->` after its start, or is two characters long if there isn't one
+		"""
+		comment_ends = self.comment_ends
+		for i in range(start, end):
+			if self.kinds[i] == COMMENT_START:
+				ix = self.positions[i]
+				j = comment_ends.bisect_left(ix)
+				if j < len(comment_ends):
+					self.items[i] = comment_ends[j] + 3 - ix
+				else:
+					self.items[i] = 2
+	
+	def _reset_tables(self):
+		# Where searches end up. Each entry is stored relative to the token
+		# it's for, and the tables are filled in from one end of the document,
+		# so the entries an edit doesn't touch stay put.
+		
+		# before[k]: k minus the opening tag a backward search through tokens
+		# k-1 to 0 stops at (-1 for none), if nothing is hit directly;
+		# before_level[k]: whether that's an unclosed tag at the level the
+		# search started at (which may still close a pending tag) rather than
+		# a mismatched one inside a pair
+		self.before = [1]
+		self.before_level = [False]
+		
+		# after[len(positions) - k]: the token a forward search from token k
+		# stops at (a closing tag or comment end, len(positions) for none)
+		# minus k; after_level: whether that's a closing tag at the level the
+		# search started at rather than a mismatched one inside a pair
+		self.after = [0]
+		self.after_level = [False]
+		
+		# reach[i]: how far right tokens up to i can reach. A search from a
+		# position past it can't start inside any of them
+		self.reach = []
+	
+	def tag(self, i):
+		"""
+		Tag() for token i, moved to where it is now
+		"""
+		tag = self.items[i]
+		ix = self.positions[i]
+		if tag.start != ix:
+			tag.end += ix - tag.start
+			tag.start = ix
+		return tag
+	
+	def comment_end(self, i):
+		"""
+		End of the comment started by token i
+		"""
+		return self.positions[i] + self.items[i]
+	
+	def find_comment_start(self, ix):
+		"""
+		Position of the nearest comment start at or before ix (or 0)
+		"""
+		i = self.comment_starts.bisect_right(ix) - 1
+		if i >= 0:
+			return self.comment_starts[i]
+		return 0
+	
+	def find_before(self, k):
+		"""
+		The opening tag a backward search through tokens k-1 to 0 stops at,
+		and whether it's at the level the search started at
+		"""
+		kinds = self.kinds
+		items = self.items
+		before = self.before
+		before_level = self.before_level
+		
+		for i in range(len(before) - 1, k):
+			kind = kinds[i]
+			if kind == OPEN:
+				if items[i].unary:
+					t, level = i - before[i], before_level[i]
+				else:
+					t, level = i, True
+			elif kind == CLOSE:
+				t = i - before[i]
+				if before_level[i] and items[t].name == items[i].name:
+					# skip to the left of its pair
+					t, level = t - before[t], before_level[t]
+				else:
+					level = False
+			elif kind == COMMENT_START:
+				t, level = i - before[i], before_level[i]
+			else:
+				j = self.positions.bisect_left(self.find_comment_start(self.positions[i]))
+				t, level = j - before[j], before_level[j]
+			
+			before.append(i + 1 - t)
+			before_level.append(level)
+		
+		return k - before[k], before_level[k]
+	
+	def find_after(self, k):
+		"""
+		The token a forward search from token k stops at, and whether it's
+		a closing tag at the level the search started at
+		"""
+		kinds = self.kinds
+		items = self.items
+		n = len(kinds)
+		after = self.after
+		after_level = self.after_level
+		
+		for i in range(n - len(after), k - 1, -1):
+			kind = kinds[i]
+			if kind == OPEN:
+				j = n - i - 1
+				if items[i].unary:
+					t, level = i + 1 + after[j], after_level[j]
+				else:
+					t = i + 1 + after[j]
+					if after_level[j] and items[t].name == items[i].name:
+						# skip to the right of its pair
+						j = n - t - 1
+						t, level = t + 1 + after[j], after_level[j]
+					else:
+						level = False
+			elif kind == CLOSE:
+				t, level = i, True
+			elif kind == COMMENT_START:
+				t = self.positions.bisect_left(self.comment_end(i))
+				j = n - t
+				t, level = t + after[j], after_level[j]
+			else:
+				t, level = i, False
+			
+			after.append(t - i)
+			after_level.append(level)
+		
+		j = n - k
+		return k + after[j], after_level[j]
+	
+	def find_reach(self, i):
+		"""
+		How far right tokens up to i can reach
+		"""
+		kinds = self.kinds
+		reach = self.reach
+		
+		for j in range(len(reach), i + 1):
+			furthest = reach and reach[-1] or 0
+			if kinds[j] == OPEN or kinds[j] == CLOSE:
+				furthest = max(furthest, self.tag(j).end)
+			elif kinds[j] == COMMENT_START:
+				# comments count as hit when they end right at the position
+				furthest = max(furthest, self.comment_end(j) + 1)
+			reach.append(furthest)
+		
+		return reach[i]
+	
+	def find_pair(self, start_ix, action=make_range):
+		"""
+		Search for the tag pair around <code>start_ix</code>, with the
+		same results as a character by character search
+		@type start_ix: int
+		@type action: function
+		"""
+		kinds = self.kinds
+		items = self.items
+		
+		backward_stack = []
+		opening_tag = None
+		closing_tag = None
+		
+		first = self.positions.bisect_left(start_ix)
+		
+#		find opening tag: tokens which may contain start_ix are looked at one by one...
+		k = first
+		while k > 0 and self.find_reach(k - 1) > start_ix:
+			i = k - 1
+			kind = kinds[i]
+			if kind == CLOSE: # found closing tag
+				tmp_tag = self.tag(i)
+				if tmp_tag.end > start_ix: # direct hit on searched closing tag
+					closing_tag = tmp_tag
+				else:
+					backward_stack.append(tmp_tag)
+			elif kind == OPEN: # found opening tag
+				tmp_tag = self.tag(i)
+				if tmp_tag.unary:
+					if tmp_tag.end > start_ix: # exact match
+						return action(tmp_tag, None, start_ix)
+				elif backward_stack and backward_stack[-1].name == tmp_tag.name:
+					backward_stack.pop()
+				else: # found nearest unclosed tag
+					opening_tag = tmp_tag
+					break
+			elif kind == COMMENT_START: # found comment start
+				end_ix = self.comment_end(i)
+				if end_ix >= start_ix:
+					return action(Comment(self.positions[i], end_ix))
+			else: # found comment end
+				# skip left to the comment start
+				i = self.positions.bisect_left(self.find_comment_start(self.positions[i]))
+			
+			k = i
+		
+#		... and the rest skip from one unclosed tag to the next
+		while not opening_tag:
+			t, level = self.find_before(k)
+			if t < 0:
+				return action(None)
+			if level and backward_stack and backward_stack[-1].name == items[t].name:
+				backward_stack.pop()
+				k = t
+			else:
+				opening_tag = self.tag(t)
+		
+		# find closing tag
+		if not closing_tag:
+			t, level = self.find_after(first)
+			if t < len(kinds):
+				if kinds[t] == COMMENT_END:
+					# looks like cursor was inside comment with invalid HTML
+					ix = self.positions[t]
+					return action(Comment( self.find_comment_start(ix), ix + 3 ))
+				closing_tag = self.tag(t)
+		
+		return action(opening_tag, closing_tag, start_ix)
+	
+	def update(self, html):
+		"""
+		Re-index the document after it's been edited into <code>html</code>
+		
+		Only the tokens from the last tag boundary before the first changed
+		character up to the last changed one are read again; those after
+		it are moved.
+		"""
+		old = self.html
+		start = _common_prefix(old, html)
+		suffix = _common_suffix(old, html, min(len(old), len(html)) - start)
+		old_end = len(old) - suffix
+		new_end = len(html) - suffix
+		delta = new_end - old_end
+		
+		start = _tag_boundary(html, start)
+		
+		self.html = html
+		n = len(self.kinds)
+		positions, kinds, items, comment_starts, comment_ends = self._tokenize(start, new_end)
+		
+		i1, i2 = self.positions.replace(start, old_end, positions, delta)
+		self.kinds[i1:i2] = kinds
+		self.items[i1:i2] = items
+		self.comment_starts.replace(start, old_end, comment_starts, delta)
+		self.comment_ends.replace(start, old_end, comment_ends, delta)
+		
+		# comments opened before the changed tokens may end somewhere else now
+		changed = i1
+		ends = self.comment_ends
+		last_end = ends.bisect_left(start) - 1
+		lo = self.comment_starts.bisect_left(last_end >= 0 and ends[last_end] or 0)
+		hi = self.comment_starts.bisect_left(start)
+		if lo < hi:
+			changed = self.positions.bisect_left(self.comment_starts[lo])
+			self._measure_comments(changed, i1)
+		self._measure_comments(i1, i1 + len(positions))
+		
+		# drop the table entries which may depend on the changed tokens
+		del self.before[i1 + 1:]
+		del self.before_level[i1 + 1:]
+		del self.after[n - i2 + 1:]
+		del self.after_level[n - i2 + 1:]
+		del self.reach[changed:]
+		
+		if self.check:
+			self._check()
+	
+	def _tokens(self):
+		tokens = []
+		for i, kind in enumerate(self.kinds):
+			if kind == OPEN or kind == CLOSE:
+				tag = self.tag(i)
+				tokens.append((kind, tag.start, tag.end, tag.name, tag.unary, tag.full_match))
+			else:
+				tokens.append((kind, self.positions[i], kind == COMMENT_START and self.items[i]))
+		return tokens
+	
+	def _check(self):
+		expected = TagIndex(self.html)
+		if self._tokens() != expected._tokens():
+			raise ValueError('tag index out of sync after update')
+		if self.comment_starts.to_list() != expected.comment_starts.to_list() or self.comment_ends.to_list() != expected.comment_ends.to_list():
+			raise ValueError('comment index out of sync after update')
+		n = len(self.kinds)
+		for k in range(len(self.before)):
+			if self.find_before(k) != expected.find_before(k):
+				raise ValueError('before table out of sync at %d after update' % k)
+		for j in range(len(self.after)):
+			if self.find_after(n - j) != expected.find_after(n - j):
+				raise ValueError('after table out of sync at %d after update' % (n - j))
+		for i in range(len(self.reach)):
+			if self.reach[i] != expected.find_reach(i):
+				raise ValueError('reach table out of sync at %d after update' % i)
+
+def _common_prefix(a, b):
+	"""
+	Length of the common prefix of a and b, comparing a block at a time
+	and then halving the one that differs
+	"""
+	n = min(len(a), len(b))
+	lo, hi = 0, n
+	while lo < n:
+		end = min(lo + BLOCK, n)
+		if a[lo:end] != b[lo:end]:
+			hi = end
+			break
+		lo = end
+	
+	while hi - lo > 1:
+		mid = (lo + hi) // 2
+		if a[lo:mid] == b[lo:mid]:
+			lo = mid
+		else:
+			hi = mid
+	return lo
+
+def _common_suffix(a, b, limit):
+	"""
+	Length of the common suffix of a and b, up to limit
+	"""
+	la, lb = len(a), len(b)
+	lo, hi = 0, limit
+	while lo < limit:
+		end = min(lo + BLOCK, limit)
+		if a[la - end:la - lo] != b[lb - end:lb - lo]:
+			hi = end
+			break
+		lo = end
+	
+	while hi - lo > 1:
+		mid = (lo + hi) // 2
+		if a[la - mid:la - lo] == b[lb - mid:lb - lo]:
+			lo = mid
+		else:
+			hi = mid
+	return lo
+
+def _tag_boundary(html, ix):
+	"""
+	Position just past the last `>` before <code>ix</code> which no tag or
+	comment match starting before it reads past, so changes from ix on
+	can't change what's matched there. A match can only read past `>` in
+	a quoted attribute value, and only the last quote of each kind can be
+	open there.
+	"""
+	end = html.rfind('>', 0, ix)
+	while end != -1:
+		for quote in '"\'':
+			q = html.rfind(quote, 0, end)
+			if q != -1 and _opens_value(html, q):
+				break
+		else:
+			return end + 1
+		end = html.rfind('>', 0, end)
+	return 0
+
+def _opens_value(html, ix):
+	"""
+	Whether the quote at <code>ix</code> could open an attribute value
+	"""
+	ix -= 1
+	while ix >= 0 and html[ix].isspace():
+		ix -= 1
+	return ix >= 0 and html[ix] == '='
+
+"The most recently indexed document"
+_index = None
+
+def get_index(html):
+	"""
+	Get the tag index for <code>html</code>, updating the last one built
+	if it was for a different (i.e. edited) version of the document
+	@type html: str
+	@return TagIndex
+	"""
+	global _index
+	
+	index = _index
+	if index is None:
+		index = _index = TagIndex(html)
+	elif not (index.html is html or index.html == html):
+		index.update(html)
+	return index
+
 def match(html, start_ix):
 	"""
 	Search for matching tags in <code>html</code>, starting from
@@ -136,6 +696,148 @@ def find(html, start_ix):
 	"""
 	return _find_pair(html, start_ix)
 
+def is_inside(html, start_ix, name, window=WINDOW):
+	"""
+	Tells if match() would find <code>start_ix</code> inside a
+	<code>name</code> tag (i.e. save an opening <code>name</code> tag in
+	<code>last_match</code>), looking at no more than <code>window</code>
+	characters either side of it. Doesn't index the document or change
+	<code>last_match</code>.
+	
+	@type html: str
+	@type start_ix: int
+	@type name: str
+	@param name: Tag name, in lower case
+	
+	@return: True or False, or None if the window isn't enough to tell
+	"""
+	lo = max(0, start_ix - window)
+	
+	backward_stack = []
+	closing_tag = None
+	
+	# same search as _find_pair(), over the characters before `end`
+	end = start_ix
+	comment_end = html.rfind('-->', lo, end + 2)
+	while True:
+		ix = html.rfind('<', lo, end)
+		if comment_end > ix: # found comment end
+			# skip left to the comment start
+			end = html.rfind('<!--', 1, comment_end + 4)
+			if end == -1:
+				end = 0
+			if end < lo:
+				return None
+			comment_end = html.rfind('-->', lo, end + 2)
+			continue
+		
+		if ix == -1:
+			if lo == 0: # no opening tag
+				return False
+			return None
+		
+		end = ix
+		m = end_tag_re.match(html, ix)
+		if m: # found closing tag
+			tmp_tag = Tag(m, ix)
+			if tmp_tag.end > start_ix: # direct hit on searched closing tag
+				closing_tag = tmp_tag
+			else:
+				backward_stack.append(tmp_tag)
+			continue
+		
+		m = start_tag_re.match(html, ix)
+		if m: # found opening tag
+			tmp_tag = Tag(m, ix)
+			if tmp_tag.unary:
+				if tmp_tag.end > start_ix: # exact match
+					return tmp_tag.name == name
+			elif backward_stack and backward_stack[-1].name == tmp_tag.name:
+				backward_stack.pop()
+			else: # found nearest unclosed tag
+				if tmp_tag.name != name:
+					return False
+				return closing_tag is not None or _ends_at_tag(html, start_ix, start_ix + window)
+		elif html.startswith('<!--', ix): # found comment start
+			end_ix = html.find('-->', ix) + 3
+			if end_ix == 2:
+				end_ix = ix + 2
+			if end_ix >= start_ix:
+				return False
+
+def _ends_at_tag(html, start_ix, end_ix):
+	"""
+	Tells if the search for a closing tag from <code>start_ix</code> would
+	find one, rather than a comment end, looking no further than
+	<code>end_ix</code>. None if it can't tell.
+	"""
+	forward_stack = []
+	
+	ix = start_ix
+	comment_end = html.find('-->', ix, end_ix + 2)
+	while True:
+		lt = html.find('<', ix, end_ix)
+		if comment_end != -1 and (lt == -1 or comment_end < lt):
+			# looks like cursor was inside comment with invalid HTML
+			return False
+		if lt == -1:
+			return None
+		
+		ix = lt + 1
+		m = start_tag_re.match(html, lt)
+		if m: # found opening tag
+			if not Tag(m, lt).unary:
+				forward_stack.append(m.group(1).lower())
+			continue
+		
+		m = end_tag_re.match(html, lt)
+		if m: #found closing tag
+			if forward_stack and forward_stack[-1] == m.group(1).lower():
+				forward_stack.pop()
+				continue
+			return True
+		
+		if html.startswith('<!--', lt): # found comment, skip to its end
+			ix = html.find('-->', lt)
+			if ix == -1:
+				ix = lt + 2
+			else:
+				ix += 3
+			comment_end = html.find('-->', ix, end_ix + 2)
+
+def match_all(html, positions):
+	"""
+	Search for matching tags around each of <code>positions</code> (e.g.
+	every caret of a multiple selection). The document is indexed once,
+	and each search after that takes a few binary searches.
+	<code>last_match</code> isn't changed.
+	
+	@param html: Code to search
+	@type html: str
+	
+	@param positions: Character indexes to search pairs for
+	@type positions: list
+	
+	@return: list of (start_ix, end_ix, opening_tag, closing_tag) tuples,
+	one per position. The indexes are None when there's no pair
+	"""
+	index = get_index(html)
+	return [index.find_pair(ix, make_match) for ix in positions]
+
+def make_match(opening_tag=None, closing_tag=None, ix=0):
+	"""
+	Makes selection range for matched tag pair, along with the pair
+	@type opening_tag: Tag
+	@type closing_tag: Tag
+	@type ix: int
+	@return tuple
+	"""
+	start_ix, end_ix = make_range(opening_tag, closing_tag, ix)
+	if start_ix == -1:
+		start_ix, end_ix = None, None
+	
+	return start_ix, end_ix, opening_tag, closing_tag
+
 def _find_pair(html, start_ix, action=make_range):
 	"""
 	Search for matching tags in <code>html</code>, starting from
@@ -153,97 +855,4 @@ def _find_pair(html, start_ix, action=make_range):
 	
 	@return: list
 	"""
-
-	forward_stack = []
-	backward_stack = []
-	opening_tag = None
-	closing_tag = None
-	html_len = len(html)
-
-	def has_match(substr, start=None):
-		if start is None:
-			start = ix
-
-		return html.find(substr, start) == start
-
-
-	def find_comment_start(start_pos):
-		while start_pos:
-			if html[start_pos] == '<' and has_match('<!--', start_pos):
-				break
-
-			start_pos -= 1
-
-		return start_pos
-
-#    find opening tag
-	ix = start_ix - 1
-	while ix >= 0:
-		ch = html[ix]
-		if ch == '<':
-			check_str = html[ix:]
-			m = re.match(end_tag, check_str)
-			if m:  # found closing tag
-				tmp_tag = Tag(m, ix)
-				if tmp_tag.start < start_ix and tmp_tag.end > start_ix: # direct hit on searched closing tag
-					closing_tag = tmp_tag
-				else:
-					backward_stack.append(tmp_tag)
-			else:
-				m = re.match(start_tag, check_str)
-				if m: # found opening tag
-					tmp_tag = Tag(m, ix);
-					if tmp_tag.unary:
-						if tmp_tag.start < start_ix and tmp_tag.end > start_ix: # exact match
-							return action(tmp_tag, None, start_ix)
-					elif backward_stack and backward_stack[-1].name == tmp_tag.name:
-						backward_stack.pop()
-					else: # found nearest unclosed tag
-						opening_tag = tmp_tag
-						break
-				elif check_str.startswith('<!--'): # found comment start
-					end_ix = check_str.find('-->') + ix + 3;
-					if ix < start_ix and end_ix >= start_ix:
-						return action(Comment(ix, end_ix))
-		elif ch == '-' and has_match('-->'): # found comment end
-			# search left until comment start is reached
-			ix = find_comment_start(ix)
-
-		ix -= 1
-		
-	if not opening_tag:
-		return action(None)
-	
-	# find closing tag
-	if not closing_tag:
-		ix = start_ix
-		while ix < html_len:
-			ch = html[ix]
-			if ch == '<':
-				check_str = html[ix:]
-				m = re.match(start_tag, check_str)
-				if m: # found opening tag
-					tmp_tag = Tag(m, ix);
-					if not tmp_tag.unary:
-						forward_stack.append(tmp_tag)
-				else:
-					m = re.match(end_tag, check_str)
-					if m:   #found closing tag
-						tmp_tag = Tag(m, ix);
-						if forward_stack and forward_stack[-1].name == tmp_tag.name:
-							forward_stack.pop()
-						else:  # found matched closing tag
-							closing_tag = tmp_tag;
-							break
-					elif has_match('<!--'): # found comment
-						ix += check_str.find('-->') + 3
-						continue
-			elif ch == '-' and has_match('-->'):
-				# looks like cursor was inside comment with invalid HTML
-				if not forward_stack or forward_stack[-1].type != 'comment':
-					end_ix = ix + 3
-					return action(Comment( find_comment_start(ix), end_ix ))
-				
-			ix += 1
-	
-	return action(opening_tag, closing_tag, start_ix)
\ No newline at end of file
+	return get_index(html).find_pair(start_ix, action)
@@ -1,24 +1,125 @@
 '''
-Registers a special handler for named HTML entities
+Registers a special handler for named HTML entities, and encodes whole
+strings with the same entities in one go
 
 Usage:
 import html_replace
 text = u'Some string with Unicode characters'
 text = text.encode('ascii', 'html_replace')
+
+# or, without going through the codec machinery for every run of
+# non-ASCII characters:
+text = html_replace.encode(text)
+text = html_replace.encode(text, html_replace.NUMERIC)
+for chunk in html_replace.iterencode(chunks):
+    ...
 '''
 
 import codecs
-import htmlentitydefs as html
+import re
+import sys
+
+try:
+    import htmlentitydefs as html
+except ImportError:
+    import html.entities as html
+
+try:
+    string_types = basestring
+    text_type = unicode
+except NameError:
+    string_types = str
+    text_type = str
+
+# on narrow builds characters outside the BMP are surrogate pairs, which
+# have to be put back together before looking them up
+NARROW = sys.maxunicode == 0xFFFF
+
+if NARROW:
+    RE_SURROGATE_PAIR = re.compile(u'[\ud800-\udbff][\udc00-\udfff]')
+
+
+class EntityTable(dict):
+    '''
+    A unicode.translate() table from code points to HTML entities
+
+    ASCII maps to itself. Other code points are given their entity the
+    first time they're looked up, so the table only ever holds the
+    characters actually encoded. names maps code points to entity names
+    (i.e. htmlentitydefs.codepoint2name); anything not in it is encoded as
+    a numeric entity.
+    '''
+
+    def __init__(self, names=None):
+        dict.__init__(self, [(code, code) for code in range(128)])
+        self.names = names or {}
+
+    def __missing__(self, code):
+        if code in self.names:
+            entity = u'&%s;' % self.names[code]
+        else:
+            entity = u'&#%s;' % code
+        self[code] = entity
+        return entity
+
+    def _pair_entity(self, match):
+        '''The entity for a surrogate pair'''
+        high, low = match.group(0)
+        return self[0x10000 + ((ord(high) - 0xD800) << 10) + (ord(low) - 0xDC00)]
+
+    def translate(self, text):
+        '''Replace every non-ASCII character in text with its entity'''
+        if not isinstance(text, text_type):
+            # byte strings have to be ASCII, as they did for the codec
+            text = text.decode('ascii')
+        if NARROW:
+            text = RE_SURROGATE_PAIR.sub(self._pair_entity, text)
+        return text.translate(self)
+
+
+NAMED = EntityTable(html.codepoint2name)
+NUMERIC = EntityTable()
+
+# characters encoded at a time by iterencode()
+CHUNK_SIZE = 65536
+
+
+def encode(text, table=NAMED):
+    '''
+    Same as text.encode('ascii', 'html_replace') with the NAMED table, or
+    'xmlcharrefreplace' with NUMERIC, in one pass over the string
+    '''
+    return table.translate(text).encode('ascii')
+
+
+def iterencode(chunks, table=NAMED):
+    '''
+    Encode an iterable of strings (or one long string, CHUNK_SIZE
+    characters at a time), yielding the encoded chunks
+    '''
+    if isinstance(chunks, string_types):
+        text = chunks
+        chunks = (text[i:i + CHUNK_SIZE] for i in range(0, len(text), CHUNK_SIZE))
+
+    pending = u''
+    for chunk in chunks:
+        if pending:
+            chunk = pending + chunk
+            pending = u''
+        if NARROW and chunk and u'\ud800' <= chunk[-1] <= u'\udbff':
+            # hold the first half of a surrogate pair back for the next chunk
+            pending = chunk[-1]
+            chunk = chunk[:-1]
+        if chunk:
+            yield encode(chunk, table)
+
+    if pending:
+        yield encode(pending, table)
+
 
 def html_replace(text):
     if isinstance(text, (UnicodeEncodeError, UnicodeTranslateError)):
-        s = []
-        for c in text.object[text.start:text.end]:
-            if ord(c) in html.codepoint2name:
-                s.append(u'&%s;' % html.codepoint2name[ord(c)])
-            else:
-                s.append(u'&#%s;' % ord(c))
-        return ''.join(s), text.end
+        return NAMED.translate(text.object[text.start:text.end]), text.end
     else:
         raise TypeError("Can't handle %s" % text.__name__)
 codecs.register_error('html_replace', html_replace)
@@ -0,0 +1,174 @@
+'''
+Line offset index for the documents cp_actions works on
+
+Finding the line around a position with find/rfind is linear in the size of
+the document; with a table of line starts it's a binary search. The table
+for the most recently used document is kept, and rebuilt whenever the
+document's text or line ending changes.
+
+Edits made through cp_actions patch the index in place (see edited()), so
+it doesn't have to be rebuilt after every insertion; only the line starts
+near an edit are touched.
+
+Usage:
+index = cp_line_index.for_context(context, content, line_ending)
+end = index.find(range.location)    # same as content.find(line_ending, range.location)
+'''
+
+import re
+
+from cp_html_matcher import Offsets
+
+# (context, line_ending, content, index) for the last document indexed
+_last = None
+
+
+class LineIndex(object):
+    '''
+    The start of every line in a document, i.e. the offset just past each
+    line ending (and 0).
+
+    find() and rfind() answer the same questions as the str methods, for
+    line endings only, without scanning the text.
+
+    Set LineIndex.check to rebuild the index from scratch after every edit
+    and raise a ValueError if the patched one doesn't match (i.e. in tests).
+    '''
+
+    check = False
+
+    def __init__(self, content, line_ending):
+        self.line_ending = line_ending
+        self.len_line_ending = len(line_ending)
+        self.pattern = re.compile(re.escape(line_ending))
+        self.length = len(content)
+
+        self.starts = Offsets([0] + [m.end() for m in self.pattern.finditer(content)])
+
+    def apply_edits(self, content, edits):
+        '''
+        Patch the index for a set of edits to the document
+
+        content is the text after the edits. edits are (location, length,
+        new_length) tuples: the range replaced, relative to the text before any
+        of the edits, and the length of its replacement. They must not overlap.
+
+        Only line endings in or touching an edit are looked for. The line
+        starts after an edit are moved lazily (see cp_html_matcher.Offsets),
+        so an edit only touches the ones between it and the previous edit.
+        '''
+        len_line_ending = self.len_line_ending
+        starts = self.starts
+
+        delta = 0
+        for location, length, new_length in sorted(edits):
+            new_location = location + delta
+            new_end = new_location + new_length
+
+            # line endings in (or overlapping) the edit are whatever's there now...
+            found = []
+            lo = max(0, new_location - len_line_ending + 1)
+            for m in self.pattern.finditer(content, lo, new_end + len_line_ending - 1):
+                if m.end() > new_location and m.start() < new_end:
+                    found.append(m.end())
+
+            # ... the ones before it are unchanged, and the ones after it just move.
+            starts.replace(new_location + 1, new_location + length + len_line_ending, found, new_length - length)
+            delta += new_length - length
+
+        self.length = len(content)
+
+        if self.check:
+            patched = starts.to_list()
+            expected = LineIndex(content, self.line_ending).starts.to_list()
+            if patched != expected:
+                raise ValueError('line index out of sync after %r: %r != %r' % (edits, patched, expected))
+
+    def __len__(self):
+        '''The number of lines'''
+        return len(self.starts)
+
+    def find(self, start, end=None):
+        '''Same as content.find(line_ending, start, end)'''
+        start = max(0, start)
+        i = self.starts.bisect_left(start + self.len_line_ending)
+        if i < len(self.starts):
+            line_start = self.starts[i]
+            if end is None or line_start <= end:
+                return line_start - self.len_line_ending
+        return -1
+
+    def rfind(self, end, start=0):
+        '''Same as content.rfind(line_ending, start, end)'''
+        i = self.starts.bisect_right(end) - 1
+        if i > 0:
+            pos = self.starts[i] - self.len_line_ending
+            if pos >= start:
+                return pos
+        return -1
+
+    def line_start(self, index):
+        '''The start of the line containing index'''
+        return self.starts[self.starts.bisect_right(index) - 1]
+
+    def line_end(self, index):
+        '''The end of the line containing index, including its line ending'''
+        i = self.starts.bisect_right(index)
+        if i < len(self.starts):
+            return self.starts[i]
+        return self.length
+
+
+def _document(context):
+    # snapshots of the same document share its index
+    return getattr(context, 'context', context)
+
+
+def _cached(context, content, line_ending):
+    last = _last
+    if last is not None and last[0] is _document(context) and last[1] == line_ending and (last[2] is content or last[2] == content):
+        return last[3]
+
+
+def for_context(context, content=None, line_ending=None):
+    '''
+    Get the line index for a context's document, building it only if the
+    document has changed since it was last indexed
+    '''
+    global _last
+
+    if content is None:
+        content = context.string()
+    if line_ending is None:
+        line_ending = context.lineEnding()
+
+    index = _cached(context, content, line_ending)
+    if index is None:
+        index = LineIndex(content, line_ending)
+        _last = (_document(context), line_ending, content, index)
+    return index
+
+
+def cached(context):
+    '''
+    Get the line index for a context's document if it's already up to date,
+    without building one
+    '''
+    last = _last
+    if last is not None and last[0] is _document(context):
+        return _cached(context, context.string(), context.lineEnding())
+
+
+def edited(context, index, edits):
+    '''
+    Patch an index from cached() for (range, text) edits just made to its
+    document, with ranges relative to the text before the edits
+    '''
+    global _last
+
+    if index is None:
+        return
+
+    content = context.string()
+    index.apply_edits(content, [(r.location, r.length, len(text)) for r, text in edits])
+    _last = (_document(context), index.line_ending, content, index)
@@ -0,0 +1,80 @@
+'''
+Per-action snapshot of a Coda document
+
+Every context.string() or context.lineEnding() call crosses the PyObjC
+bridge, and string() may convert the whole NSString each time. A
+DocumentSnapshot asks the context for each of them once (when first
+needed) and answers every later call itself, so it can be passed to the
+cp_actions helpers in place of the context.
+
+Usage:
+context = cp_actions.get_snapshot(controller)
+text, range = cp_actions.lines_and_range(context)
+'''
+
+from cp_headless import headless_string
+
+
+class DocumentSnapshot(object):
+    '''
+    A context whose text, line ending, path and indentation settings are
+    fetched at most once each
+
+    Everything else is passed straight through to the context. Edits made
+    through the snapshot go to the context too, and drop the text and
+    selection, which are fetched again if they're needed afterwards.
+    '''
+
+    def __init__(self, context):
+        self.context = context
+        self._text = None
+        self._selected_range = None
+        self._settings = {}
+
+    def _setting(self, name):
+        if name not in self._settings:
+            self._settings[name] = getattr(self.context, name)()
+        return self._settings[name]
+
+    def string(self):
+        if self._text is None:
+            # copied out of the NSString once, and sliced in Python from then on
+            self._text = headless_string(self.context.string())
+        return self._text
+
+    def stringWithRange_(self, range):
+        return self.string().substringWithRange_(range)
+
+    def lineEnding(self):
+        return self._setting('lineEnding')
+
+    def path(self):
+        return self._setting('path')
+
+    def usesTabs(self):
+        return self._setting('usesTabs')
+
+    def tabWidth(self):
+        return self._setting('tabWidth')
+
+    def selectedRange(self):
+        if self._selected_range is None:
+            self._selected_range = self.context.selectedRange()
+        return self._selected_range
+
+    def setSelectedRange_(self, range):
+        self._selected_range = None
+        self.context.setSelectedRange_(range)
+
+    def replaceCharactersInRange_withString_(self, range, text):
+        self._text = None
+        self._selected_range = None
+        self.context.replaceCharactersInRange_withString_(range, text)
+
+    def insertText_(self, text):
+        self._text = None
+        self._selected_range = None
+        self.context.insertText_(text)
+
+    def __getattr__(self, name):
+        return getattr(self.context, name)
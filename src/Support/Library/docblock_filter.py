@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+'''
+Command line Docblock filter
+
+Reads (PHP) source from files or stdin, and writes it to stdout with a
+docblock added to every undocumented class, interface, trait, function
+and member variable. Input is processed a line at a time, so memory use
+doesn't grow with the size of the file.
+
+Directories are walked for PHP files, which are sharded across a pool of
+worker processes (one generator per worker), as are all the files when
+documenting in place. Results come back in sorted path order, whatever
+order the workers finish in. Files named on the command line are streamed
+one after the other.
+
+Usage:
+docblock_filter.py [--lang php] [FILE ...] > documented.php
+cat foo.php | docblock_filter.py > documented.php
+docblock_filter.py --in-place --jobs 8 src/
+'''
+
+import argparse
+import collections
+import io
+import itertools
+import multiprocessing
+import os
+import shutil
+import sys
+
+from cp_actions import extract_insertion_point_range
+from Docblock import Docblock, PHP_EXTENSIONS
+
+# latin-1 maps every byte to a character and back again, so whatever the
+# real encoding is, everything we don't touch is passed through unchanged.
+DEFAULT_ENCODING = 'latin-1'
+
+# options and generators for pool workers, set up once per worker process
+_worker_options = {}
+_worker_generators = {}
+
+
+def detect_line_ending(line):
+    '''Guess the line ending of a file from its first line'''
+    for line_ending in ('\r\n', '\n', '\r'):
+        if line.endswith(line_ending):
+            return line_ending
+    return '\n'
+
+
+def get_lang(lang, path=None):
+    '''Resolve the auto lang from a path's file extension'''
+    if lang == 'auto' and path is not None:
+        pos = path.rfind('.')
+        if pos != -1:
+            lang = path[pos+1:].lower()
+    return lang
+
+
+def get_docblock(lang, path=None):
+    '''Get a Docblock generator for lang, guessing from the path if lang is auto'''
+    return Docblock.get(get_lang(lang, path))
+
+
+def documented(lines, d):
+    '''
+    Generate (line, docblock) pairs for a source file, with the insertion
+    point tokens stripped from each docblock
+
+    Line endings for the generated docblocks are taken from the first line.
+    '''
+    lines = iter(lines)
+    for first in lines:
+        d = d.withLineEnding(detect_line_ending(first))
+
+        for line, docblock in d.documentLines(itertools.chain((first,), lines)):
+            if docblock:
+                docblock, ip_range = extract_insertion_point_range(docblock)
+            yield line, docblock
+
+
+def document_lines(lines, d):
+    '''Generate the chunks of a documented source file from its lines'''
+    for line, docblock in documented(lines, d):
+        if docblock:
+            yield docblock
+        yield line
+
+
+def find_sources(paths):
+    '''Expand directories into the (sorted) PHP files inside them'''
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                pos = name.rfind('.')
+                if pos != -1 and name[pos+1:].lower() in PHP_EXTENSIONS:
+                    yield os.path.join(root, name)
+
+
+def init_worker(lang, encoding, in_place):
+    _worker_options.update(lang=lang, encoding=encoding, in_place=in_place)
+    _worker_generators.clear()
+
+
+def document_file(path):
+    '''
+    Pool worker: document a single file
+
+    Returns a (path, count, text) tuple, where count is the number of
+    docblocks added. When documenting in place, the file is rewritten by the
+    worker and text is None.
+    '''
+    lang = get_lang(_worker_options['lang'], path)
+    encoding = _worker_options['encoding']
+
+    d = _worker_generators.get(lang)
+    if d is None:
+        d = _worker_generators[lang] = Docblock.get(lang)
+
+    chunks = []
+    count = 0
+    f = io.open(path, 'r', encoding=encoding, newline='')
+    try:
+        for line, docblock in documented(f, d):
+            if docblock:
+                chunks.append(docblock)
+                count += 1
+            chunks.append(line)
+    finally:
+        f.close()
+
+    if not _worker_options['in_place']:
+        return path, count, ''.join(chunks)
+
+    if count:
+        tmp = path + '.docblock-tmp'
+        f = io.open(tmp, 'w', encoding=encoding, newline='')
+        try:
+            f.writelines(chunks)
+        finally:
+            f.close()
+        shutil.copymode(path, tmp)
+        os.rename(tmp, path)
+
+    return path, count, None
+
+
+def document_chunk(paths):
+    '''Pool worker: document a chunk of files, returning a list of document_file() results'''
+    return [document_file(path) for path in paths]
+
+
+def document_files(paths, lang, encoding, in_place=False, jobs=None, chunksize=None):
+    '''
+    Document many files, sharded across a pool of worker processes
+
+    Generates a (path, count, text) tuple for each file, in the same order as
+    paths; see document_file(). Only a couple of chunks per worker are handed
+    out ahead of the one being generated, so finished texts don't pile up
+    while the caller writes them out.
+    '''
+    paths = list(paths)
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    jobs = max(1, min(jobs, len(paths)))
+
+    if jobs == 1:
+        init_worker(lang, encoding, in_place)
+        for path in paths:
+            yield document_file(path)
+        return
+
+    if chunksize is None:
+        # a few chunks per worker evens out the load without too much overhead
+        chunksize = max(1, len(paths) // (jobs * 4))
+
+    chunks = (paths[i:i + chunksize] for i in range(0, len(paths), chunksize))
+    pending = collections.deque()
+
+    pool = multiprocessing.Pool(jobs, init_worker, (lang, encoding, in_place))
+    try:
+        for chunk in itertools.islice(chunks, jobs * 2):
+            pending.append(pool.apply_async(document_chunk, (chunk,)))
+        while pending:
+            results = pending.popleft().get()
+            chunk = next(chunks, None)
+            if chunk is not None:
+                pending.append(pool.apply_async(document_chunk, (chunk,)))
+            for result in results:
+                yield result
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+def open_input(path, encoding):
+    # newline='' keeps line endings intact, whatever they happen to be
+    if path == '-':
+        return io.open(sys.stdin.fileno(), 'r', encoding=encoding, newline='', closefd=False)
+    return io.open(path, 'r', encoding=encoding, newline='')
+
+
+def open_output(encoding):
+    return io.open(sys.stdout.fileno(), 'w', encoding=encoding, newline='', closefd=False)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Add docblocks to undocumented PHP declarations.')
+    parser.add_argument('files', nargs='*', default=['-'], metavar='FILE',
+                        help='source files or directories to document (default: stdin)')
+    parser.add_argument('-l', '--lang', default='auto',
+                        help='source language, or auto to guess from the file extension (default: auto)')
+    parser.add_argument('-e', '--encoding', default=DEFAULT_ENCODING,
+                        help='source encoding (default: %s)' % DEFAULT_ENCODING)
+    parser.add_argument('-i', '--in-place', action='store_true',
+                        help='rewrite files in place, and list how many docblocks were added to each')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='maximum number of worker processes (default: one per CPU)')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='files handed to a worker at a time (default: a few chunks per worker)')
+
+    args = parser.parse_args(argv)
+    if '-' in args.files and args.in_place:
+        parser.error('stdin can\'t be documented in place')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    lang = args.lang.lower()
+
+    out = open_output(args.encoding)
+    try:
+        if args.in_place:
+            paths = list(find_sources(args.files))
+            for path, count, text in document_files(paths, lang, args.encoding, True, args.jobs, args.chunksize):
+                out.write(u'%s: %d\n' % (path, count))
+            return 0
+
+        for path in args.files:
+            if os.path.isdir(path):
+                paths = list(find_sources([path]))
+                for path, count, text in document_files(paths, lang, args.encoding, False, args.jobs, args.chunksize):
+                    out.write(text)
+                continue
+
+            # stream files named on their own, rather than loading them up in a worker
+            f = open_input(path, args.encoding)
+            try:
+                d = get_docblock(lang, None if path == '-' else path)
+                for chunk in document_lines(f, d):
+                    out.write(chunk)
+            finally:
+                f.close()
+    finally:
+        out.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
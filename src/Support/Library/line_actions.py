@@ -3,7 +3,7 @@ Line utility functions for working with Line Commands
 @author Justin Hileman <http://justinhileman.com>
 '''
 
-import tea_actions as tea
+import cp_actions as cp
 
 def is_line_ending(content, index, line_ending):
     '''Checks whether the character(s) at index equals line_ending'''
@@ -16,8 +16,8 @@ def get_line_before(context, range = None):
 
 def get_line_before_and_range(context, range = None):
     '''Get the full line immediately before the current (or supplied) range'''
-    line_ending = tea.get_line_ending(context)
-    if range is None: range = tea.get_range(context)
+    line_ending = cp.get_line_ending(context)
+    if range is None: range = cp.get_range(context)
     content = context.string()
 
     end = content.rfind(line_ending, 0, range.location)
@@ -34,9 +34,9 @@ def get_line_before_and_range(context, range = None):
     
     start = max(0, start)
     end = min(end, len(content))
-    line_range = tea.new_range(start, end - start)
+    line_range = cp.new_range(start, end - start)
     
-    return tea.get_selection(context, line_range), line_range
+    return cp.get_selection(context, line_range), line_range
 
 def get_line_after(context, range = None):
     line, line_range = get_line_after_and_range(context, range)
@@ -44,9 +44,9 @@ def get_line_after(context, range = None):
 
 def get_line_after_and_range(context, range = None):
     '''Get the full line immediately after the current (or supplied) range'''
-    line_ending = tea.get_line_ending(context)
+    line_ending = cp.get_line_ending(context)
     len_line_ending = len(line_ending)
-    if range is None: range = tea.get_range(context)
+    if range is None: range = cp.get_range(context)
     content = context.string()
     
     start = range.location + range.length
@@ -66,15 +66,15 @@ def get_line_after_and_range(context, range = None):
     
     start = max(0, start)
     end = min(end, len(content))
-    line_range = tea.new_range(start, end - start)
+    line_range = cp.new_range(start, end - start)
     
-    return tea.get_selection(context, line_range), line_range
+    return cp.get_selection(context, line_range), line_range
 
 def lines_and_range(context, range = None):
     '''Get the range of the full lines containing the current (or supplied) range'''
-    line_ending = tea.get_line_ending(context)
+    line_ending = cp.get_line_ending(context)
     len_line_ending = len(line_ending)
-    if range is None: range = tea.get_range(context)
+    if range is None: range = cp.get_range(context)
     content = context.string()
     
     start, end = range.location, range.location + range.length
@@ -109,9 +109,9 @@ def lines_and_range(context, range = None):
     start = max(0, start)
     end = min(end, len(content))
     
-    line_range = tea.new_range(start, end - start)
+    line_range = cp.new_range(start, end - start)
     
-    return tea.get_selection(context, line_range), line_range
+    return cp.get_selection(context, line_range), line_range
 
 def balance_line_endings(first, second, line_ending):
     '''Swaps the line endings on first and second lines'''
@@ -0,0 +1,132 @@
+'''
+Function parameter list parsing, shared by the Docblock generators
+
+Usage:
+for param in parse_params("array $a = array(1, 2), &...$rest"):
+    # param.type, param.name, param.default, param.by_ref, param.variadic
+'''
+
+import re
+
+# everything in a parameter list which can open or close a nesting level, or
+# split it up. Escapes are matched as a pair so an escaped quote is skipped.
+TOKENS = re.compile(r'''\\.|["'()\[\]{},=]''')
+
+OPENERS = frozenset('([{')
+CLOSERS = frozenset(')]}')
+QUOTES  = frozenset('"\'')
+
+# characters which can mark a name as by-reference (`&`) or variadic (`...`,
+# or `*`/`**` in Python)
+MARKERS = '&.*'
+
+# modifiers on PHP promoted constructor params, which aren't part of the type
+MODIFIERS = frozenset(('public', 'protected', 'private', 'readonly'))
+
+
+class Param(object):
+    """
+    A single parameter from a parameter list.
+
+    type and default are None when the parameter doesn't give one. variadic
+    is the variadic marker as written (`...`, `*` or `**`), or None.
+    """
+
+    __slots__ = ('type', 'name', 'default', 'by_ref', 'variadic')
+
+    def __init__(self, type, name, default=None, by_ref=False, variadic=None):
+        self.type = type
+        self.name = name
+        self.default = default
+        self.by_ref = by_ref
+        self.variadic = variadic
+
+    def declaration(self):
+        """
+        The name with its by-reference and variadic markers, as PHP would
+        have it (`&...$name`).
+        """
+        return ('&' if self.by_ref else '') + (self.variadic or '') + self.name
+
+    def __repr__(self):
+        return 'Param(%r, %r, %r, %r, %r)' % (self.type, self.name, self.default, self.by_ref, self.variadic)
+
+
+def parse_params(s):
+    '''
+    Parse a parameter list (without the surrounding parens) into Params
+
+    Walks the list once, keeping track of brackets and quoted strings, so
+    commas and `=` in default values like `array(1, 2)`, `[1, 2]` or `', '`
+    don't split a parameter. Empty parameters (e.g. after a trailing comma)
+    are skipped.
+    '''
+    params = []
+    start = 0
+    equals = None
+    depth = 0
+    quote = None
+
+    for match in TOKENS.finditer(s):
+        token = match.group(0)
+        if quote:
+            if token == quote:
+                quote = None
+        elif token in QUOTES:
+            quote = token
+        elif token in OPENERS:
+            depth += 1
+        elif token in CLOSERS:
+            if depth:
+                depth -= 1
+        elif depth:
+            continue
+        elif token == ',':
+            _append_param(params, s, start, equals, match.start())
+            start = match.end()
+            equals = None
+        elif token == '=' and equals is None:
+            equals = match.start()
+
+    _append_param(params, s, start, equals, len(s))
+    return params
+
+
+def _append_param(params, s, start, equals, end):
+    default = None
+    if equals is None:
+        head = s[start:end]
+    else:
+        head = s[start:equals]
+        default = s[equals+1:end].strip()
+
+    param_type = None
+    if ':' in head:
+        # a Python annotation, `name: type`
+        head, param_type = head.split(':', 1)
+        param_type = param_type.strip() or None
+
+    words = head.split()
+    if not words:
+        return
+
+    name = words.pop()
+
+    # markers written apart from the name, as in `Foo & $a` or `Foo ... $a`
+    while words and not words[-1].strip(MARKERS):
+        name = words.pop() + name
+
+    marker = name[:len(name) - len(name.lstrip(MARKERS))]
+    if marker:
+        name = name[len(marker):]
+    if not name:
+        return
+
+    words = [w for w in words if w not in MODIFIERS]
+    if words:
+        param_type = ' '.join(words)
+
+    by_ref = '&' in marker
+    variadic = marker.replace('&', '') or None
+
+    params.append(Param(param_type, name, default, by_ref, variadic))
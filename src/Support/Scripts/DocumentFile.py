@@ -0,0 +1,34 @@
+'''Document every class, function and member variable in a (PHP) file'''
+
+import cp_actions as cp
+from Docblock import Docblock
+
+def act(controller, bundle, options):
+    '''
+    Required action method
+    
+    Supplying a lang option will override the automatic language guessing
+    (which might not be such a bad thing...)
+    '''
+    
+    context = cp.get_snapshot(controller)
+
+    lang = cp.get_option(options, 'lang', 'auto').lower()
+    
+    # get the file extension so we can guess the language.
+    if lang == 'auto':
+        lang = cp.get_file_extension(context) or lang
+    
+    d = Docblock.get(lang, cp.get_line_ending(context))
+    
+    insertions = d.documentSource(context.string())
+    
+    if not insertions:
+        cp.beep()
+        return
+    
+    # there's no sensible place to leave the cursor, so drop the insertion points
+    cp.insert_texts(context, [
+        (cp.new_range(offset, 0), cp.extract_insertion_point_range(docblock)[0])
+        for offset, docblock in insertions
+    ])
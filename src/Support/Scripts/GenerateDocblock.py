@@ -2,6 +2,7 @@
 
 import cp_actions as cp
 from Docblock import Docblock
+from DocumentScanner import DEFAULT_LOOKAHEAD, HeaderAssembler
 
 def act(controller, bundle, options):
     '''
@@ -9,21 +10,21 @@ def act(controller, bundle, options):
     
     Supplying a lang option will override the automatic language guessing
     (which might not be such a bad thing...)
+    
+    Declarations spread over several lines are documented whole; the
+    lookahead option caps how many lines past the first we'll read looking
+    for the end of one.
     '''
     
-    context = cp.get_context(controller)
+    context = cp.get_snapshot(controller)
 
     lang = cp.get_option(options, 'lang', 'auto').lower()
     
     # get the file extension so we can guess the language.
     if lang == 'auto':
-        path = context.path()
-        if path is not None:
-            pos = path.rfind('.')
-            if pos != -1:
-                lang = path[pos+1:]
+        lang = cp.get_file_extension(context) or lang
     
-    d = Docblock.get(lang)
+    d = Docblock.get(lang, cp.get_line_ending(context))
     
     # get the current line
     text, target_range = cp.lines_and_range(context)
@@ -42,7 +43,16 @@ def act(controller, bundle, options):
     
     insert_range = cp.new_range(target_range.location, 0)
     
-    d.setLineEnding(cp.get_line_ending(context))
+    # put the rest of the declaration header together, if it runs on to the lines below
+    header = HeaderAssembler(int(cp.get_option(options, 'lookahead', DEFAULT_LOOKAHEAD)))
+    if not header.feed(text) and header.lookahead:
+        for line, line_range in cp.iter_lines_after_and_range(context, target_range):
+            if header.feed(line) or header.full():
+                break
+        
+        if header.complete:
+            text = header.header()
+    
     docblock = d.doc(text)
     
     if docblock:
@@ -0,0 +1,86 @@
+'''The number of context calls an action makes doesn't grow with the document'''
+
+import os
+import sys
+import unittest
+
+SUPPORT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'Support')
+sys.path[:0] = [os.path.join(SUPPORT, 'Library'), os.path.join(SUPPORT, 'Scripts')]
+
+import cp_headless
+import cp_line_index
+import DocumentFile
+import GenerateDocblock
+
+BODY = '''class Foo extends Bar
+{
+    public $x = 5;
+
+    public function oneLine($a, $b = 5)
+    {
+    }
+
+    public function __construct(
+        Baz $baz,
+        array $opts = array('a' => 1), // options
+        &...$rest
+    ) {
+    }
+}
+'''
+
+SIZES = (0, 1000, 20000)
+
+
+def source(lines):
+    '''BODY with `lines` lines of code on either side'''
+    pad = '$x = 1;\n' * lines
+    return '<?php\n' + pad + BODY + pad
+
+
+def counted(action, text, selected_range=None, **options):
+    '''Run an action on a counting context, returning the calls it made and the new text'''
+    # start from a cold line index, as for a newly opened document
+    cp_line_index._last = None
+    context = cp_headless.CountingContext(cp_headless.TextContext(text, '\n', path='/src/foo.php', selected_range=selected_range))
+    action.act(cp_headless.Controller(context), None, cp_headless.Options(options))
+    return context.calls, context.context.text
+
+
+class BridgeCallsTest(unittest.TestCase):
+
+    def assertConstantCalls(self, runs):
+        calls = [run[0] for run in runs]
+        for size, call in zip(SIZES, calls):
+            self.assertTrue(call.get('string', 0) <= 2, (size, call))
+            self.assertEqual(call.get('lineEnding'), 1, (size, call))
+        self.assertEqual(calls, [calls[0]] * len(calls))
+
+    def generate(self, needle):
+        runs = []
+        for lines in SIZES:
+            text = source(lines)
+            location = text.index(needle) + 3
+            calls, new_text = counted(GenerateDocblock, text, cp_headless.Range(location, 0), lang='auto')
+            self.assertTrue('/**' in new_text[:location], lines)
+            runs.append((calls, len(new_text) - len(text)))
+        return runs
+
+    def test_generate_docblock_one_line(self):
+        runs = self.generate('public function oneLine')
+        self.assertConstantCalls(runs)
+        self.assertEqual(len(set(run[1] for run in runs)), 1)
+
+    def test_generate_docblock_multiline_header(self):
+        runs = self.generate('public function __construct')
+        self.assertConstantCalls(runs)
+        self.assertEqual(len(set(run[1] for run in runs)), 1)
+
+    def test_document_file(self):
+        runs = [counted(DocumentFile, source(lines), lang='php') for lines in SIZES]
+        self.assertConstantCalls(runs)
+        self.assertEqual(runs[0][0]['string'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+'''Block structure tracking in DocumentScanner'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'Support', 'Library'))
+
+from Docblock import Docblock
+
+
+SOURCE = '''<?php
+class A
+{
+    function a()
+    {
+        $x = <<<EOT
+Don't stop
+EOT;
+        $y = <<<'NOW'
+It's a nowdoc, {
+  NOW;
+        $z = <<< "EOS"
+    "quoted" heredoc
+    EOS;
+    }
+
+    function b($x)
+    {
+    }
+?>
+<p>It's html {</p>
+<?php
+    function c($y)
+    {
+    }
+}
+?><p>Don't</p><?= $x; ?>
+<?php
+function d()
+{
+}
+
+class E
+{
+    public $f;
+}
+'''
+
+
+def documented(source):
+    '''The stripped lines documentSource() puts a docblock before'''
+    return [
+        source[offset:source.index('\n', offset)].strip()
+        for offset, docblock in Docblock.get('php').documentSource(source, '\n')
+    ]
+
+
+class HeredocAndInlineHtmlTest(unittest.TestCase):
+
+    def test_everything_after_heredocs_and_inline_html_is_documented(self):
+        self.assertEqual(documented(SOURCE), [
+            'class A',
+            'function a()',
+            'function b($x)',
+            'function c($y)',
+            'function d()',
+            'class E',
+            'public $f;',
+        ])
+
+    def test_heredoc_closing_identifier_needs_a_word_boundary(self):
+        source = '\n'.join([
+            '<?php',
+            '$x = <<<EOT',
+            "EOTS aren't the end",
+            'EOT;',
+            'function f()',
+            '{',
+            '}',
+            '',
+        ])
+        self.assertEqual(documented(source), ['function f()'])
+
+    def test_php_close_tag_in_strings_and_comments_is_ignored(self):
+        source = '\n'.join([
+            '<?php',
+            '$x = "?>";',
+            "$y = '?>'; // comment",
+            '/* ?> */ $y = 1;',
+            'function f()',
+            '{',
+            '}',
+            '',
+        ])
+        self.assertEqual(documented(source), ['function f()'])
+
+    def test_php_close_tag_ends_one_line_comments(self):
+        for comment in ('//', '#'):
+            source = '<?php %s header ?>\n<p>Don\'t { stop</p>\n<?php\nfunction f() {}\nclass A {}\n' % comment
+            self.assertEqual(documented(source), ['function f() {}', 'class A {}'], comment)
+
+    def test_backslashes_only_escape_in_strings(self):
+        # f() counts as documented by the comment right above it
+        source = '<?php\n/* see C:\\*/\nfunction f() {}\nclass A {}\n'
+        self.assertEqual(documented(source), ['class A {}'])
+
+        source = '<?php\n$x = "a\\"b"; $y = \'C:\\\\\';\nfunction f() {}\nclass A {}\n'
+        self.assertEqual(documented(source), ['function f() {}', 'class A {}'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+'''Entity conversion, in one go and a chunk at a time'''
+
+import os
+import sys
+import unittest
+
+SUPPORT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'Support')
+sys.path[:0] = [os.path.join(SUPPORT, 'Library'), os.path.join(SUPPORT, 'Scripts')]
+
+import cp_actions
+import cp_entities as entities
+
+HEX = u'\\$HEX'
+
+# a bit of everything itertranscode() has to hold back, for cutting up at every position
+TEXT = u'a &#x41; &#X41; &#233; &eacute; &amp; &123; &cafe; & b; café —&lt;&'
+
+
+class EntitiesToHexTest(unittest.TestCase):
+
+    def assertHex(self, text, expected, wrap=HEX):
+        self.assertEqual(cp_actions.entities_to_hex(text, wrap), expected)
+
+    def test_hex_entities_are_read_as_hex(self):
+        self.assertHex(u'&#x41;', u'\\0041')
+        self.assertHex(u'&#X41;', u'\\0041')
+        self.assertHex(u'&#x1F600;', u'\\1F600')
+        self.assertHex(u'&#x41;', u'<0041>', u'<$HEX>')
+
+    def test_decimal_entities(self):
+        self.assertHex(u'&#233; &#65;', u'\\00E9 \\0041')
+
+    def test_named_entities_are_converted(self):
+        self.assertHex(u'&eacute; &amp; &lt;', u'\\00E9 \\0026 \\003C')
+
+    def test_other_ampersands_are_left_alone(self):
+        self.assertHex(u'&123; &cafe; & &#; &x41;', u'&123; &cafe; & &#; &x41;')
+
+    def test_raw_characters_are_left_alone(self):
+        self.assertHex(u'café — &eacute;', u'café — \\00E9')
+
+
+class IterTranscodeTest(unittest.TestCase):
+
+    TRANSCODERS = [
+        ('hex', HEX, False),
+        ('hex', HEX, True, True, 'named'),
+        ('named',),
+        ('raw',),
+        ('numeric', '$HEX', True, False, 'numeric'),
+    ]
+
+    def setUp(self):
+        self.chunk_size = entities.CHUNK_SIZE
+
+    def tearDown(self):
+        entities.CHUNK_SIZE = self.chunk_size
+
+    def test_cuts_anywhere(self):
+        for args in self.TRANSCODERS:
+            transcoder = entities.transcoder(*args)
+            whole = transcoder.transcode(TEXT)
+            for i in range(len(TEXT) + 1):
+                self.assertEqual(u''.join(transcoder.itertranscode([TEXT[:i], TEXT[i:]])), whole, (args, i))
+                for j in range(i, min(len(TEXT), i + 6) + 1):
+                    chunks = [TEXT[:i], TEXT[i:j], TEXT[j:]]
+                    self.assertEqual(u''.join(transcoder.itertranscode(chunks)), whole, (args, i, j))
+
+    def test_one_long_string(self):
+        for size in (1, 2, 3, 5, 7):
+            entities.CHUNK_SIZE = size
+            for args in self.TRANSCODERS:
+                transcoder = entities.transcoder(*args)
+                self.assertEqual(u''.join(transcoder.itertranscode(TEXT)), transcoder.transcode(TEXT), (args, size))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+'''The tag index finds the same pairs as the old character by character search'''
+
+import os
+import random
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'Support', 'Library'))
+
+import cp_html_matcher as matcher
+from cp_html_matcher import Comment, Tag, end_tag, make_range, start_tag
+
+DOCUMENTS = 400
+EDITED_DOCUMENTS = 150
+
+PIECES = [
+    '<div>', '</div>', '<p>', '</p>', '<br>', '<br/>', '<img src="a>b">', '<a title="</b>">', '</b>', '<b>',
+    '<!--', '-->', '--->', '<!-- x -->', '<', '>', 'text', ' ', '\n', '<span class=x>', '</span >', '<input/>',
+    '<style>', '</style>', "<a href='-->'>", '</a>', '<!', '-', '<DIV>', '</Div>',
+]
+
+# pieces that are likely to turn what's around an edit into something else
+EDIT_PIECES = PIECES + ['"', "'", '=', '="', '= "', '<a b="', '">', "x='", "'>"]
+SINGLE_CHARACTERS = ['<', '>', '"', "'", '-', '!', 'd', ' ', '/']
+
+
+def reference_find_pair(html, start_ix, action=make_range):
+    '''_find_pair() as it was before the tag index: a scan either side of start_ix'''
+    forward_stack = []
+    backward_stack = []
+    opening_tag = None
+    closing_tag = None
+    html_len = len(html)
+
+    def has_match(substr, start):
+        return html.find(substr, start) == start
+
+    def find_comment_start(start_pos):
+        while start_pos:
+            if html[start_pos] == '<' and has_match('<!--', start_pos):
+                break
+            start_pos -= 1
+        return start_pos
+
+    # find opening tag
+    ix = start_ix - 1
+    while ix >= 0:
+        ch = html[ix]
+        if ch == '<':
+            check_str = html[ix:]
+            m = re.match(end_tag, check_str)
+            if m:  # found closing tag
+                tmp_tag = Tag(m, ix)
+                if tmp_tag.start < start_ix and tmp_tag.end > start_ix:  # direct hit on searched closing tag
+                    closing_tag = tmp_tag
+                else:
+                    backward_stack.append(tmp_tag)
+            else:
+                m = re.match(start_tag, check_str)
+                if m:  # found opening tag
+                    tmp_tag = Tag(m, ix)
+                    if tmp_tag.unary:
+                        if tmp_tag.start < start_ix and tmp_tag.end > start_ix:  # exact match
+                            return action(tmp_tag, None, start_ix)
+                    elif backward_stack and backward_stack[-1].name == tmp_tag.name:
+                        backward_stack.pop()
+                    else:  # found nearest unclosed tag
+                        opening_tag = tmp_tag
+                        break
+                elif check_str.startswith('<!--'):  # found comment start
+                    end_ix = check_str.find('-->') + ix + 3
+                    if ix < start_ix and end_ix >= start_ix:
+                        return action(Comment(ix, end_ix))
+        elif ch == '-' and has_match('-->', ix):  # found comment end
+            # search left until comment start is reached
+            ix = find_comment_start(ix)
+
+        ix -= 1
+
+    if not opening_tag:
+        return action(None)
+
+    # find closing tag
+    if not closing_tag:
+        ix = start_ix
+        while ix < html_len:
+            ch = html[ix]
+            if ch == '<':
+                check_str = html[ix:]
+                m = re.match(start_tag, check_str)
+                if m:  # found opening tag
+                    tmp_tag = Tag(m, ix)
+                    if not tmp_tag.unary:
+                        forward_stack.append(tmp_tag)
+                else:
+                    m = re.match(end_tag, check_str)
+                    if m:  # found closing tag
+                        tmp_tag = Tag(m, ix)
+                        if forward_stack and forward_stack[-1].name == tmp_tag.name:
+                            forward_stack.pop()
+                        else:  # found matched closing tag
+                            closing_tag = tmp_tag
+                            break
+                    elif has_match('<!--', ix):  # found comment
+                        ix += check_str.find('-->') + 3
+                        continue
+            elif ch == '-' and has_match('-->', ix):
+                # looks like cursor was inside comment with invalid HTML
+                if not forward_stack or forward_stack[-1].type != 'comment':
+                    end_ix = ix + 3
+                    return action(Comment(find_comment_start(ix), end_ix))
+
+            ix += 1
+
+    return action(opening_tag, closing_tag, start_ix)
+
+
+class ReferenceMatch(object):
+    '''match() and last_match, as the old module had them'''
+
+    def __init__(self):
+        self.last_match = {}
+
+    def save_match(self, opening_tag=None, closing_tag=None, ix=0):
+        self.last_match['opening_tag'] = opening_tag
+        self.last_match['closing_tag'] = closing_tag
+        self.last_match['start_ix'], self.last_match['end_ix'] = make_range(opening_tag, closing_tag, ix)
+        return self.last_match['start_ix'] != -1 and (self.last_match['start_ix'], self.last_match['end_ix']) or (None, None)
+
+    def match(self, html, start_ix):
+        return reference_find_pair(html, start_ix, self.save_match)
+
+
+def describe_tag(tag):
+    if tag is None:
+        return None
+    return (tag.__class__.__name__, tag.type, tag.start, tag.end,
+            getattr(tag, 'name', None), getattr(tag, 'full_match', None),
+            getattr(tag, 'unary', None), getattr(tag, 'close_self', None))
+
+
+def describe(last_match):
+    return (describe_tag(last_match['opening_tag']), describe_tag(last_match['closing_tag']),
+            last_match['start_ix'], last_match['end_ix'])
+
+
+def random_document(r, pieces, n):
+    return ''.join(r.choice(pieces) for _ in range(r.randint(0, n)))
+
+
+class MatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        matcher._index = None
+        self.reference = ReferenceMatch()
+        self.block = matcher.BLOCK
+
+    def tearDown(self):
+        matcher._index = None
+        matcher.BLOCK = self.block
+        matcher.TagIndex.check = False
+
+    def assertSamePair(self, html, ix):
+        expected = reference_find_pair(html, ix)
+        self.assertEqual(matcher.find(html, ix), expected, (html, ix))
+
+        expected = self.reference.match(html, ix)
+        self.assertEqual((matcher.match(html, ix), describe(matcher.last_match)),
+                         (expected, describe(self.reference.last_match)), (html, ix))
+
+
+class ReferenceTest(MatcherTestCase):
+
+    def test_generated_documents(self):
+        r = random.Random(19)
+        for i in range(DOCUMENTS):
+            html = random_document(r, PIECES, 30)
+            for ix in range(len(html) + 1):
+                self.assertSamePair(html, ix)
+
+
+class EditTest(MatcherTestCase):
+
+    def edit(self, r, html):
+        '''Replace a random range of html with random pieces'''
+        start = r.randint(0, len(html))
+        end = min(len(html), start + r.choice([0, 0, 1, 1, 2, 5, 20]))
+        if r.random() < 0.3:
+            text = r.choice(SINGLE_CHARACTERS)
+        else:
+            text = ''.join(r.choice(EDIT_PIECES) for _ in range(r.choice([0, 1, 1, 2, 3])))
+        return html[:start] + text + html[end:]
+
+    def check_edits(self, seed):
+        # rebuild the index after every update, and fail if the updated one differs
+        matcher.TagIndex.check = True
+        r = random.Random(seed)
+        for i in range(EDITED_DOCUMENTS):
+            html = random_document(r, EDIT_PIECES, 40)
+            matcher._index = None
+            for step in range(r.randint(1, 12)):
+                # searches fill in some of the tables the next update has to patch
+                for j in range(r.randint(0, 4)):
+                    self.assertSamePair(html, r.randint(0, len(html)))
+                html = self.edit(r, html)
+                self.assertEqual(matcher.get_index(html).html, html)
+            for ix in range(len(html) + 1):
+                self.assertSamePair(html, ix)
+
+    def test_random_edits(self):
+        self.check_edits(21)
+
+    def test_random_edits_across_blocks(self):
+        # compare documents a few characters at a time, so changes span blocks
+        matcher.BLOCK = 4
+        self.check_edits(2121)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+'''Patching the line index for random edits keeps it in sync with the text'''
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'Support', 'Library'))
+
+from cp_line_index import LineIndex
+
+ROUNDS = 300
+PIECES = ['a', 'bc', ' ', '\n', '\r', '\r\n', '\n\n', 'x\r\ny']
+
+
+def random_text(r, n):
+    return ''.join(r.choice(PIECES) for _ in range(n))
+
+
+def random_edits(r, length):
+    '''Non-overlapping (location, length, text) edits, relative to a text of length'''
+    points = sorted(r.randint(0, length) for _ in range(2 * r.randint(1, 4)))
+    edits = []
+    for location, end in zip(points[::2], points[1::2]):
+        edits.append((location, end - location, random_text(r, r.randint(0, 4))))
+    r.shuffle(edits)
+    return edits
+
+
+def apply(text, edits):
+    for location, length, new_text in sorted(edits, reverse=True):
+        text = text[:location] + new_text + text[location + length:]
+    return text
+
+
+class LineIndexEditTest(unittest.TestCase):
+
+    def setUp(self):
+        LineIndex.check = True
+
+    def tearDown(self):
+        LineIndex.check = False
+
+    def assertMatchesText(self, index, text, line_ending):
+        for pos in range(len(text) + 1):
+            self.assertEqual(index.find(pos), text.find(line_ending, pos), pos)
+            self.assertEqual(index.rfind(pos), text.rfind(line_ending, 0, pos), pos)
+            self.assertEqual(index.line_start(pos), text.rfind(line_ending, 0, pos) + len(line_ending) if line_ending in text[:pos] else 0, pos)
+
+    def test_random_edits(self):
+        r = random.Random(16)
+        for line_ending in ('\n', '\r\n', '\r'):
+            for i in range(ROUNDS):
+                text = random_text(r, r.randint(0, 30))
+                index = LineIndex(text, line_ending)
+                # several rounds of edits on the same index, so the lazy shift carries over
+                for j in range(r.randint(1, 5)):
+                    edits = random_edits(r, len(text))
+                    text = apply(text, edits)
+                    index.apply_edits(text, [(location, length, len(new_text)) for location, length, new_text in edits])
+                self.assertMatchesText(index, text, line_ending)
+                self.assertEqual(len(index), text.count(line_ending) + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+'''Type guessing for default values'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'Support', 'Library'))
+
+from PHPDocblock import PHPDocblock
+from PyDocblock import PyDocblock
+
+
+class GuessTypeTest(unittest.TestCase):
+
+    def test_anything_isdigit_takes_is_an_int(self):
+        # \d only matches decimal digits; superscripts, circled and
+        # subscript digits are isdigit() too
+        for d in (PHPDocblock(), PyDocblock()):
+            for s in (u'5', u'٣', u'²', u'1³', u'①', u'₅'):
+                self.assertEqual(d.guessType(s), 'int', (d, s))
+
+    def test_other_literals(self):
+        d = PHPDocblock()
+        self.assertEqual(d.guessType(u'1.5'), 'float')
+        self.assertEqual(d.guessType(u'².5'), 'mixed')
+        self.assertEqual(d.guessType(u'"x"'), 'string')
+        self.assertEqual(d.guessType(u' true '), 'bool')
+        self.assertEqual(d.guessType(u'array(1)'), 'array')
+        self.assertEqual(d.guessType(u'null'), 'mixed')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+'''Parameter lists are only split on commas outside brackets and strings'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'Support', 'Library'))
+
+from param_parser import parse_params
+from PHPDocblock import PHPDocblock
+
+# source, (type, name, default, by_ref, variadic) for each param, paramsCallback() lines
+CASES = [
+    ('$a = array(1, 2), $b', [
+        (None, '$a', 'array(1, 2)', False, None),
+        (None, '$b', None, False, None),
+    ], [
+        '@param array $a (default: array(1, 2))',
+        '@param mixed $b',
+    ]),
+    ('$a = [a, b], $b', [
+        (None, '$a', '[a, b]', False, None),
+        (None, '$b', None, False, None),
+    ], [
+        '@param mixed $a (default: [a, b])',
+        '@param mixed $b',
+    ]),
+    ("$s = 'a,b', $t", [
+        (None, '$s', "'a,b'", False, None),
+        (None, '$t', None, False, None),
+    ], [
+        "@param string $s (default: 'a,b')",
+        '@param mixed $t',
+    ]),
+    ('$s = "q\\"uote,", $t = 1', [
+        (None, '$s', '"q\\"uote,"', False, None),
+        (None, '$t', '1', False, None),
+    ], [
+        '@param string $s (default: "q\\"uote,")',
+        '@param int $t (default: 1)',
+    ]),
+    ('$f = function ($x, $y = 2) use ($z) { return [$x, $y]; }, Closure $g = null', [
+        (None, '$f', 'function ($x, $y = 2) use ($z) { return [$x, $y]; }', False, None),
+        ('Closure', '$g', 'null', False, None),
+    ], [
+        '@param mixed $f (default: function ($x, $y = 2) use ($z) { return [$x, $y]; })',
+        '@param Closure $g (default: null)',
+    ]),
+    ('Foo & $a, Bar ... $b', [
+        ('Foo', '$a', None, True, None),
+        ('Bar', '$b', None, False, '...'),
+    ], [
+        '@param Foo &$a',
+        '@param Bar ...$b',
+    ]),
+    ('&...$rest', [
+        (None, '$rest', None, True, '...'),
+    ], [
+        '@param mixed &...$rest',
+    ]),
+    ('int $a = 1, $b,', [
+        ('int', '$a', '1', False, None),
+        (None, '$b', None, False, None),
+    ], [
+        '@param int $a (default: 1)',
+        '@param mixed $b',
+    ]),
+    ('$a, , ', [
+        (None, '$a', None, False, None),
+    ], [
+        '@param mixed $a',
+    ]),
+    ('public readonly int $x, private ?Foo $y = null', [
+        ('int', '$x', None, False, None),
+        ('?Foo', '$y', 'null', False, None),
+    ], [
+        '@param int $x',
+        '@param ?Foo $y (default: null)',
+    ]),
+]
+
+
+def fields(param):
+    return (param.type, param.name, param.default, param.by_ref, param.variadic)
+
+
+class ParseParamsTest(unittest.TestCase):
+
+    def test_params(self):
+        for source, params, lines in CASES:
+            self.assertEqual([fields(param) for param in parse_params(source)], params, source)
+
+    def test_params_callback(self):
+        d = PHPDocblock('\n')
+        for source, params, lines in CASES:
+            self.assertEqual(d.paramsCallback(source).split('\n'), lines, source)
+
+    def test_nothing_to_document(self):
+        d = PHPDocblock('\n')
+        for source in ('', ' ', ',', ' , '):
+            self.assertEqual(parse_params(source), [], repr(source))
+            self.assertEqual(d.paramsCallback(source), None, repr(source))
+
+
+if __name__ == '__main__':
+    unittest.main()
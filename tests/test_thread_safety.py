@@ -0,0 +1,110 @@
+'''Generators shared between threads don't see each other's signatures'''
+
+import os
+import random
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'Support', 'Library'))
+
+from PHPDocblock import PHPDocblock
+
+THREADS = 8
+CALLS = 1500
+LINE_ENDINGS = ('\n', '\r\n')
+
+
+def signatures(n=200, seed=9):
+    '''A mix of classes, functions and member variables, with and without docblocks to generate'''
+    r = random.Random(seed)
+    modifiers = ['public', 'private', 'protected', 'static', 'abstract', 'final']
+    params = ['$a', 'int $b', '$c = 5', '$d = "x"', '&$e', '$f = array(1,2)', '$g = null', '$h=1.5', '...$i', "$j = 'a,b'"]
+    names = ['foo', '_bar', '__get', '_Tx', 'getX', 'isY']
+    lines = []
+    for i in range(n):
+        mods = ' '.join(r.choice(modifiers) for _ in range(r.randint(0, 2)))
+        mods = mods + ' ' if mods else ''
+        ws = r.choice(['', '    ', '\t'])
+        name = r.choice(names)
+        kind = r.choice(['function', 'function', 'class', 'member', 'interface', 'other'])
+        if kind == 'function':
+            lines.append('%s%sfunction %s(%s)%s' % (ws, mods, name, ', '.join(r.sample(params, r.randint(0, 4))), r.choice(['', ' {', ';'])))
+        elif kind == 'class':
+            lines.append('%s%sclass %s%s%s' % (ws, mods, name, r.choice(['', ' extends Base']), r.choice(['', ' implements A, B'])))
+        elif kind == 'member':
+            lines.append('%s%s$%s%s' % (ws, mods, name, r.choice([';', ' = 5;', ' = "s";', ' = array();', ' = true;', ' = 1.5;'])))
+        elif kind == 'interface':
+            lines.append('%sinterface %s extends J' % (ws, name))
+        else:
+            lines.append('%sreturn $this->%s;' % (ws, name))
+    return lines
+
+
+class SharedGeneratorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.lines = signatures()
+        # switch threads as often as possible, so calls interleave
+        if hasattr(sys, 'setswitchinterval'):
+            self.interval = sys.getswitchinterval()
+            sys.setswitchinterval(1e-6)
+        else:
+            self.interval = sys.getcheckinterval()
+            sys.setcheckinterval(1)
+
+    def tearDown(self):
+        if hasattr(sys, 'setswitchinterval'):
+            sys.setswitchinterval(self.interval)
+        else:
+            sys.setcheckinterval(self.interval)
+        PHPDocblock.disableCache()
+
+    def expected(self):
+        '''The docblock and matches for every line and line ending, from private instances'''
+        expected = {}
+        for line_ending in LINE_ENDINGS:
+            for line in self.lines:
+                d = PHPDocblock(line_ending)
+                expected[line_ending, line] = (d.doc(line), dict(d.matches))
+        return expected
+
+    def mismatches(self):
+        expected = self.expected()
+        PHPDocblock.registry().resetStats()
+        shared = dict((line_ending, PHPDocblock(line_ending)) for line_ending in LINE_ENDINGS)
+        errors = []
+
+        def worker(seed):
+            r = random.Random(seed)
+            for i in range(CALLS):
+                line_ending = r.choice(LINE_ENDINGS)
+                line = r.choice(self.lines)
+                d = shared[line_ending]
+                docblock = d.doc(line)
+                if (docblock, dict(d.matches)) != expected[line_ending, line]:
+                    errors.append((line_ending, line))
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_no_cross_talk(self):
+        self.assertEqual(self.mismatches(), [])
+
+    def test_no_cross_talk_with_cache(self):
+        # small enough that entries are evicted while other threads use them
+        PHPDocblock.enableCache(50)
+        self.assertEqual(self.mismatches(), [])
+
+    def test_dispatch_counters_are_exact(self):
+        self.assertEqual(self.mismatches(), [])
+        # with no cache, every doc() call dispatches its line once
+        self.assertEqual(PHPDocblock.registry().stats()['lines'], THREADS * CALLS)
+
+
+if __name__ == '__main__':
+    unittest.main()